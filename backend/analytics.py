@@ -0,0 +1,102 @@
+# analytics.py
+
+import numpy as np
+
+TRADING_DAYS = 252
+
+
+def _returns(prices):
+    """Simple returns of a (dates x n) price array; gaps count as flat."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = prices[1:] / prices[:-1] - 1.0
+    return np.nan_to_num(returns, nan=0.0, posinf=0.0, neginf=0.0)
+
+
+def portfolio_analytics(closes, holdings, tickers, benchmark,
+                        risk_free=0.0):
+    """Risk and return metrics for a portfolio in one batched pass.
+
+    `closes` is a date x ticker price frame covering the held `tickers`
+    and the benchmark column; `holdings` is the matching date x ticker
+    quantity frame. The benchmark may be held too, in which case its
+    column serves both. Portfolio returns are time-weighted: each day's
+    return is earned by the previous day's holdings, so buys and sells do
+    not count as gains.
+    """
+    tickers = [t for t in tickers if t in closes.columns]
+    prices = closes.ffill().to_numpy(dtype=float)
+    if len(prices) < 3 or not tickers:
+        return None
+
+    columns = [closes.columns.get_loc(t) for t in tickers]
+    asset_prices = prices[:, columns]
+    quantities = holdings.reindex(index=closes.index, columns=tickers,
+                                  fill_value=0).to_numpy(dtype=float)
+
+    # Value of yesterday's holdings at yesterday's and today's prices
+    held = quantities[:-1]
+    start_value = np.nansum(held * asset_prices[:-1], axis=1)
+    end_value = np.nansum(held * asset_prices[1:], axis=1)
+    # Only days on which something was held count towards the metrics
+    active = start_value > 0
+    if active.sum() < 2:
+        return None
+    portfolio = end_value[active] / start_value[active] - 1.0
+
+    asset_returns = _returns(asset_prices)[active]
+    benchmark_returns = _returns(
+        prices[:, closes.columns.get_loc(benchmark)][:, None])[active, 0] \
+        if benchmark in closes.columns else np.zeros(active.sum())
+
+    # One covariance matrix covers every beta and correlation:
+    # columns are [assets..., portfolio, benchmark]
+    matrix = np.column_stack([asset_returns, portfolio, benchmark_returns])
+    cov = np.cov(matrix, rowvar=False)
+    std = np.sqrt(np.diag(cov))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        corr = cov / np.outer(std, std)
+        betas = cov[:, -1] / cov[-1, -1]
+    n_assets = len(tickers)
+
+    growth = np.cumprod(1.0 + portfolio)
+    drawdown = growth / np.maximum.accumulate(growth) - 1.0
+    periods = len(portfolio)
+    volatility = std[n_assets] * np.sqrt(TRADING_DAYS)
+    excess = portfolio.mean() - risk_free / TRADING_DAYS
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = excess / std[n_assets] * np.sqrt(TRADING_DAYS)
+
+    latest_value = quantities[-1] * np.nan_to_num(asset_prices[-1])
+    total = latest_value.sum()
+    weights = latest_value / total if total else np.zeros(n_assets)
+
+    def clean(value):
+        value = float(value)
+        return value if np.isfinite(value) else None
+
+    return {
+        'start': closes.index[0].strftime('%Y-%m-%d'),
+        'end': closes.index[-1].strftime('%Y-%m-%d'),
+        'benchmark': benchmark,
+        'time_weighted_return': clean(growth[-1] - 1.0),
+        'annualized_return': clean(
+            growth[-1] ** (TRADING_DAYS / periods) - 1.0),
+        'annualized_volatility': clean(volatility),
+        'max_drawdown': clean(drawdown.min()),
+        'sharpe_ratio': clean(sharpe),
+        'beta': clean(betas[n_assets]),
+        'positions': {
+            ticker: {
+                'weight': clean(weights[i]),
+                'beta': clean(betas[i]),
+                'annualized_volatility': clean(
+                    std[i] * np.sqrt(TRADING_DAYS)),
+            }
+            for i, ticker in enumerate(tickers)
+        },
+        'correlation': {
+            'tickers': tickers,
+            # Serialized with NaN as null for tickers with flat prices
+            'matrix': np.ascontiguousarray(corr[:n_assets, :n_assets]),
+        },
+    }
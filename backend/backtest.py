@@ -0,0 +1,237 @@
+# backtest.py
+
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from analytics import TRADING_DAYS
+
+# Rebalance on the first trading day of each period; 'none' buys once
+SCHEDULES = {
+    'none': None,
+    'daily': 'D',
+    'weekly': 'W',
+    'monthly': 'M',
+    'quarterly': 'Q',
+    'yearly': 'Y',
+}
+
+MAX_ALLOCATIONS = 1000
+
+
+class BacktestError(Exception):
+    pass
+
+
+def rebalance_mask(dates, schedule):
+    """True on the dates a `schedule` rebalances on."""
+    if schedule not in SCHEDULES:
+        raise BacktestError(f'Unknown rebalance schedule {schedule}')
+    mask = np.zeros(len(dates), dtype=bool)
+    if SCHEDULES[schedule] is None:
+        mask[:1] = True
+        return mask
+    periods = pd.DatetimeIndex(dates).to_period(SCHEDULES[schedule])
+    mask[0] = True
+    mask[1:] = periods[1:] != periods[:-1]
+    return mask
+
+
+def simulate_weights(prices, weights, mask, initial=10000.0, cost=0.0):
+    """Value of K target allocations over a (dates x tickers) price array.
+
+    `weights` is K x tickers. Between rebalances share counts are fixed,
+    so each holding period is one matrix product for every allocation at
+    once. Weight on tickers without a price yet, and whatever the weights
+    leave below 100%, is kept as cash. `cost` is charged on the value
+    traded. Returns (values K x dates, turnover K).
+    """
+    n_dates = len(prices)
+    n_allocations = len(weights)
+    available = ~np.isnan(prices)
+    filled = np.nan_to_num(prices)
+    values = np.empty((n_allocations, n_dates))
+    turnover = np.zeros(n_allocations)
+    shares = np.zeros(weights.shape)
+    cash = np.full(n_allocations, float(initial))
+
+    starts = np.flatnonzero(mask)
+    ends = np.append(starts[1:], n_dates)
+    for start, end in zip(starts, ends):
+        price = filled[start]
+        value = shares @ price + cash
+        target = np.where(available[start], weights, 0.0) * value[:, None]
+        traded = np.abs(target - shares * price).sum(axis=1)
+        if start:
+            # The initial purchase isn't turnover
+            turnover += np.divide(traded, value, out=np.zeros_like(value),
+                                  where=value > 0) / 2
+        value = value - traded * cost
+        with np.errstate(divide='ignore', invalid='ignore'):
+            shares = np.where(available[start],
+                              weights * value[:, None] / price, 0.0)
+        cash = value - shares @ price
+        values[:, start:end] = shares @ filled[start:end].T + cash[:, None]
+    return values, turnover
+
+
+def simulate_trades(closes, trades, initial=10000.0, cost=0.0):
+    """Value of replaying a trade list, filled at each trade date's close.
+
+    `closes` is a date x ticker frame covering every traded ticker and
+    `trades` has date, ticker and signed quantity columns. Trades dated
+    before the first close fill on the first date, those after the last
+    are dropped. Returns (values 1 x dates, turnover 1).
+    """
+    prices = closes.to_numpy(dtype=float)
+    filled = np.nan_to_num(prices)
+    rows = np.searchsorted(closes.index.to_numpy(dtype='datetime64[ns]'),
+                           trades['date'].to_numpy(dtype='datetime64[ns]'))
+    keep = rows < len(closes)
+    rows = rows[keep]
+    columns = closes.columns.get_indexer(trades['ticker'])[keep]
+    quantities = trades['quantity'].to_numpy(dtype=float)[keep]
+
+    traded = np.zeros(prices.shape)
+    np.add.at(traded, (rows, columns), quantities)
+    flows = traded * filled
+    cash = initial - np.cumsum(flows.sum(axis=1) +
+                               np.abs(flows).sum(axis=1) * cost)
+    values = (np.cumsum(traded, axis=0) * filled).sum(axis=1) + cash
+
+    average = np.abs(values).mean()
+    turnover = np.abs(flows).sum() / average / 2 if average else 0.0
+    return values[None, :], np.array([turnover])
+
+
+def summarize(values, initial):
+    """Return, risk and drawdown of each row of a K x dates value array."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = values[:, 1:] / values[:, :-1] - 1.0
+        returns = np.nan_to_num(returns, nan=0.0, posinf=0.0, neginf=0.0)
+        total = values[:, -1] / initial - 1.0
+        years = values.shape[1] / TRADING_DAYS
+        annualized = np.sign(1.0 + total) * \
+            np.abs(1.0 + total) ** (1.0 / years) - 1.0
+        std = returns.std(axis=1, ddof=1) if returns.shape[1] > 1 \
+            else np.zeros(len(values))
+        sharpe = returns.mean(axis=1) / std * np.sqrt(TRADING_DAYS)
+        drawdown = values / np.maximum.accumulate(values, axis=1) - 1.0
+    return {
+        'final_value': values[:, -1],
+        'total_return': total,
+        'annualized_return': annualized,
+        'volatility': std * np.sqrt(TRADING_DAYS),
+        'sharpe': np.nan_to_num(sharpe, nan=0.0, posinf=0.0, neginf=0.0),
+        'max_drawdown': np.nan_to_num(drawdown.min(axis=1)),
+    }
+
+
+class Backtester:
+    """Runs weight backtests, spreading big sweeps over a process pool.
+
+    The pool is started on first use with the 'spawn' method, as forking a
+    multi-threaded gunicorn worker is unsafe. With `workers` 0 everything
+    runs in the calling thread.
+    """
+
+    def __init__(self, workers=0):
+        self.workers = workers
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'))
+            return self._pool
+
+    def run(self, prices, weights, schedules, initial=10000.0, cost=0.0,
+            parallel=False):
+        """Every allocation under every (distinct) schedule.
+
+        Returns [(schedule, values K x dates, turnover K)] in input order.
+        """
+        masks = [rebalance_mask(prices.index, s) for s in schedules]
+        matrix = prices.to_numpy(dtype=float)
+        parallel = parallel and self.workers > 1
+        # Each holding period costs a Python iteration whatever the number
+        # of allocations, so chunks are as large as the workers allow
+        chunks = np.array_split(weights, min(
+            self.workers if parallel else 1, len(weights)))
+        tasks = [(s, mask, chunk)
+                 for s, mask in zip(schedules, masks) for chunk in chunks]
+
+        if parallel:
+            pool = self.pool()
+            futures = [pool.submit(simulate_weights, matrix, chunk, mask,
+                                   initial, cost)
+                       for _, mask, chunk in tasks]
+            outputs = [f.result() for f in futures]
+        else:
+            outputs = [simulate_weights(matrix, chunk, mask, initial, cost)
+                       for _, mask, chunk in tasks]
+
+        results = []
+        for schedule, mask in zip(schedules, masks):
+            parts = [out for (s, _, _), out in zip(tasks, outputs)
+                     if s == schedule]
+            results.append((schedule,
+                            np.concatenate([v for v, _ in parts]),
+                            np.concatenate([t for _, t in parts])))
+        return results
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+def parse_allocations(allocations):
+    """Tickers and a K x tickers weight matrix from a list of
+    {ticker: weight} dicts."""
+    if not isinstance(allocations, list) or not allocations:
+        raise BacktestError('allocations must be a non-empty list')
+    if not all(isinstance(a, dict) for a in allocations):
+        raise BacktestError('Each allocation must map tickers to weights')
+    if len(allocations) > MAX_ALLOCATIONS:
+        raise BacktestError(
+            f'At most {MAX_ALLOCATIONS} allocations per request')
+    tickers = sorted({t.upper() for a in allocations for t in a})
+    weights = np.zeros((len(allocations), len(tickers)))
+    columns = {t: i for i, t in enumerate(tickers)}
+    for row, allocation in enumerate(allocations):
+        for ticker, weight in allocation.items():
+            weights[row, columns[ticker.upper()]] += float(weight)
+    if (weights < 0).any():
+        raise BacktestError('Weights must not be negative')
+    if (weights.sum(axis=1) > 1 + 1e-9).any():
+        raise BacktestError('Weights must not add up to more than 1')
+    return tickers, weights
+
+
+def parse_trades(trades):
+    """A date, ticker, quantity frame from a list of trade dicts. Quantity
+    is signed, or positive with a 'buy'/'sell' type."""
+    if not isinstance(trades, list) or not trades:
+        raise BacktestError('trades must be a non-empty list')
+    rows = []
+    for trade in trades:
+        quantity = float(trade['quantity'])
+        if trade.get('type', 'buy') == 'sell':
+            quantity = -quantity
+        rows.append((pd.Timestamp(trade['date']), trade['ticker'].upper(),
+                     quantity))
+    return pd.DataFrame(rows, columns=['date', 'ticker', 'quantity'])
+
+
+def create_backtester():
+    return Backtester(
+        workers=int(os.environ.get('BACKTEST_WORKERS', os.cpu_count() or 1)))
@@ -0,0 +1,207 @@
+"""Offline latency and throughput of the main API endpoints over seeded
+ledgers of different sizes.
+
+    python benchmarks/endpoints.py --transactions 1000,100000 --tickers 10,1000
+    python benchmarks/endpoints.py --output baseline.json
+    python benchmarks/endpoints.py --baseline baseline.json --tolerance 0.25
+    DATABASE_URL=postgresql://... python benchmarks/endpoints.py
+
+Quotes and bars come from the replay providers (synthetic unless
+REPLAY_DIR holds recorded fixtures), so no network is needed and runs are
+repeatable. Requests go through the Flask test client in-process. With
+--baseline, exits non-zero when any p50 got slower than the baseline by
+more than --tolerance. The target database is wiped, so do not point it
+at real data.
+"""
+import argparse
+from datetime import datetime, timedelta
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+INITIAL_BALANCE = 1e12
+SEED_CHUNK = 10000
+
+
+def seed_ledger(db, Transaction, user_id, n_transactions, tickers, rng):
+    """Insert a random but consistent ledger: sells never exceed holdings."""
+    now = datetime.utcnow()
+    start = now - timedelta(days=3 * 365)
+    step = (now - start) / n_transactions
+    held = dict.fromkeys(tickers, 0)
+    rows = []
+    for i in range(n_transactions):
+        ticker = rng.choice(tickers)
+        quantity = rng.randint(1, 20)
+        side = 'sell' if held[ticker] >= quantity and rng.random() < 0.3 \
+            else 'buy'
+        held[ticker] += quantity if side == 'buy' else -quantity
+        rows.append({'user_id': user_id, 'ticker': ticker,
+                     'quantity': quantity, 'transaction_type': side,
+                     'price': round(rng.uniform(5, 500), 2),
+                     'timestamp': start + step * i})
+        if len(rows) == SEED_CHUNK:
+            db.session.execute(db.insert(Transaction), rows)
+            rows = []
+    if rows:
+        db.session.execute(db.insert(Transaction), rows)
+    db.session.commit()
+
+
+def run(app, name, requests, threads):
+    """Issue every request from `threads` clients; return stats in ms."""
+    latencies, errors = [], []
+    lock = threading.Lock()
+    chunks = [requests[i::threads] for i in range(threads)]
+
+    def worker(chunk):
+        client = app.test_client()
+        for method, url, kwargs in chunk:
+            started = time.perf_counter()
+            response = client.open(url, method=method, **kwargs)
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                if response.status_code >= 400:
+                    errors.append(response.status_code)
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(c,)) for c in chunks]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    wall = time.perf_counter() - started
+
+    ms = np.array(latencies) * 1000
+    return {
+        'endpoint': name,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'p50': float(np.percentile(ms, 50)),
+        'p95': float(np.percentile(ms, 95)),
+        'p99': float(np.percentile(ms, 99)),
+        'rps': len(latencies) / wall,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--transactions', default='1000,100000',
+                        help='comma separated ledger sizes')
+    parser.add_argument('--tickers', default='10,100',
+                        help='comma separated ticker counts')
+    parser.add_argument('--requests', type=int, default=50,
+                        help='requests per endpoint')
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write results as JSON here')
+    parser.add_argument('--baseline', help='JSON results to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed p50 slowdown against the baseline')
+    args = parser.parse_args()
+
+    if 'DATABASE_URL' not in os.environ:
+        path = os.path.join(tempfile.mkdtemp(), 'endpoints.sqlite')
+        os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    # Background refreshes would skew the measurements
+    os.environ.setdefault('PREWARM', '0')
+    os.environ['QUOTE_PROVIDER'] = 'replay'
+    os.environ['HISTORY_PROVIDER'] = 'replay'
+    # Synthetic tickers aren't listed; keep the typeahead index empty
+    os.environ.setdefault('TICKER_LISTING', os.devnull)
+    # Each scenario runs as its own user
+    os.environ['TRUST_USER_HEADER'] = '1'
+
+    from app import app
+    from models import db, Transaction, Preference
+    from positions import rebuild_positions
+    from trades import BALANCE_KEY
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+    results = []
+    for n_transactions in map(int, args.transactions.split(',')):
+        for n_tickers in map(int, args.tickers.split(',')):
+            # A user per scenario, so no cache carries over between them
+            user_id = f'bench-{n_transactions}-{n_tickers}'
+            tickers = [f'T{i:04d}' for i in range(n_tickers)]
+            rng = random.Random(args.seed)
+            started = time.perf_counter()
+            with app.app_context():
+                seed_ledger(db, Transaction, user_id, n_transactions,
+                            tickers, rng)
+                db.session.add(Preference(user_id=user_id, key=BALANCE_KEY,
+                                          value=str(INITIAL_BALANCE)))
+                rebuild_positions(user_id)
+            print(f'\n{n_transactions} transactions x {n_tickers} tickers '
+                  f'(seeded in {time.perf_counter() - started:.1f}s)')
+
+            headers = {'X-User-Id': user_id}
+            get = lambda url: ('GET', url, {'headers': headers})  # noqa: E731
+            scenarios = {
+                'portfolio_details':
+                    [get('/api/portfolio_details')] * args.requests,
+                'portfolio_history':
+                    [get('/api/portfolio_history')] * args.requests,
+                'stock_history': [
+                    get(f'/api/stock_history/{tickers[i % n_tickers]}'
+                        '?range=1y')
+                    for i in range(args.requests)],
+                'buy_sell': [
+                    ('POST', f'/api/{side}', {'headers': headers, 'json': {
+                        'ticker': tickers[i // 2 % n_tickers],
+                        'quantity': 1}})
+                    for i in range(args.requests)
+                    for side in [('buy', 'sell')[i % 2]]],
+            }
+
+            print(f'{"endpoint":<20}{"cold ms":>10}{"p50 ms":>10}'
+                  f'{"p95 ms":>10}{"p99 ms":>10}{"req/s":>10}{"errors":>8}')
+            for name, requests in scenarios.items():
+                # The first call fills caches and the bar table; a warm-up
+                # pass does the same for the rest of the tickers
+                cold = run(app, name, requests[:1], 1)
+                run(app, name, requests, args.threads)
+                result = run(app, name, requests, args.threads)
+                result.update(transactions=n_transactions, tickers=n_tickers,
+                              threads=args.threads, cold=cold['p50'])
+                results.append(result)
+                print(f'{name:<20}{result["cold"]:>10.1f}{result["p50"]:>10.1f}'
+                      f'{result["p95"]:>10.1f}{result["p99"]:>10.1f}'
+                      f'{result["rps"]:>10.1f}{result["errors"]:>8}')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=1)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = {(r['endpoint'], r['transactions'], r['tickers']): r
+                        for r in json.load(f)}
+        regressions = []
+        for r in results:
+            before = baseline.get((r['endpoint'], r['transactions'],
+                                   r['tickers']))
+            if before and r['p50'] > before['p50'] * (1 + args.tolerance):
+                regressions.append(
+                    f'{r["endpoint"]} ({r["transactions"]} x {r["tickers"]}):'
+                    f' p50 {before["p50"]:.1f} -> {r["p50"]:.1f} ms')
+        if regressions:
+            print('\nRegressions:\n  ' + '\n  '.join(regressions))
+            sys.exit(1)
+        print('\nNo regressions against the baseline')
+
+
+if __name__ == '__main__':
+    main()
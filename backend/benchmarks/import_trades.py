@@ -0,0 +1,70 @@
+"""Time /api/transactions/import on a synthetic broker export.
+
+    python benchmarks/import_trades.py --rows 100000
+    DATABASE_URL=postgresql://... python benchmarks/import_trades.py
+
+The target database is wiped, so do not point it at real data.
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+
+def make_csv(rows, tickers, seed=0):
+    rng = random.Random(seed)
+    start = datetime(2015, 1, 2)
+    held = {}
+    lines = ['ticker,quantity,side,price,timestamp']
+    for i in range(rows):
+        ticker = f'T{rng.randrange(tickers):03d}'
+        side = 'sell' if held.get(ticker, 0) > 10 and rng.random() < 0.3 \
+            else 'buy'
+        quantity = rng.randint(1, 10)
+        held[ticker] = held.get(ticker, 0) + \
+            (quantity if side == 'buy' else -quantity)
+        timestamp = start + timedelta(minutes=i)
+        lines.append(f'{ticker},{quantity},{side},'
+                     f'{rng.uniform(5, 500):.2f},{timestamp.isoformat()}')
+    return ('\n'.join(lines) + '\n').encode()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--tickers', type=int, default=200)
+    args = parser.parse_args()
+
+    if 'DATABASE_URL' not in os.environ:
+        path = os.path.join(tempfile.mkdtemp(), 'import.sqlite')
+        os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    os.environ.setdefault('QUOTE_PROVIDER', 'static')
+
+    from app import app
+    from models import db
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+    body = make_csv(args.rows, args.tickers)
+    client = app.test_client()
+    started = time.monotonic()
+    response = client.post('/api/transactions/import?format=csv',
+                           data=io.BytesIO(body),
+                           content_type='text/csv')
+    elapsed = time.monotonic() - started
+
+    print(response.status_code, response.get_json())
+    print(f'{args.rows} rows ({len(body) / 1e6:.1f} MB) in {elapsed:.2f}s, '
+          f'{args.rows / elapsed:,.0f} rows/sec')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Minimal HTTP load generator for comparing serving modes.
+
+Run it once against the dev server and once against gunicorn:
+
+    APP_ENV=development python app.py
+    gunicorn -c gunicorn.conf.py wsgi:app
+    python benchmarks/load_test.py --url http://localhost:5000/api/portfolio
+"""
+import argparse
+import threading
+import time
+import urllib.request
+
+
+def worker(url, stop_at, latencies, errors, lock):
+    while time.monotonic() < stop_at:
+        started = time.monotonic()
+        try:
+            with urllib.request.urlopen(url, timeout=30) as response:
+                response.read()
+            ok = True
+        except Exception:
+            ok = False
+        elapsed = time.monotonic() - started
+        with lock:
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors.append(elapsed)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', action='append', required=True,
+                        help='may be given more than once')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10.0)
+    args = parser.parse_args()
+
+    for url in args.url:
+        latencies, errors, lock = [], [], threading.Lock()
+        stop_at = time.monotonic() + args.duration
+        threads = [threading.Thread(target=worker,
+                                    args=(url, stop_at, latencies, errors,
+                                          lock))
+                   for _ in range(args.concurrency)]
+        started = time.monotonic()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.monotonic() - started
+
+        print(url)
+        print(f'  requests/sec: {len(latencies) / elapsed:10.1f}')
+        print(f'  errors:       {len(errors):10d}')
+        for pct in (50, 90, 99):
+            print(f'  p{pct} latency:  '
+                  f'{percentile(latencies, pct) * 1000:10.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
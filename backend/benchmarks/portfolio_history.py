@@ -0,0 +1,85 @@
+"""Compare the old per-date/per-ticker loop in get_portfolio_history with
+the vectorized engine in portfolio_engine.py on synthetic data.
+
+    python benchmarks/portfolio_history.py --tickers 200 --years 5
+"""
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from portfolio_engine import holdings_over_time, portfolio_values  # noqa: E402
+
+
+def make_data(n_tickers, years, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end=pd.Timestamp.today().normalize(),
+                           periods=252 * years)
+    tickers = [f'T{i:04d}' for i in range(n_tickers)]
+    returns = rng.normal(0, 0.01, size=(len(dates), n_tickers))
+    closes = pd.DataFrame(100 * np.exp(returns.cumsum(axis=0)),
+                          index=dates, columns=tickers)
+    quantities = {t: int(q) for t, q in
+                  zip(tickers, rng.integers(1, 100, n_tickers))}
+    deltas = pd.DataFrame({'date': dates[0], 'ticker': tickers,
+                           'quantity': list(quantities.values())})
+    return closes, quantities, deltas
+
+
+def loop_values(data, tickers, quantities):
+    # The original implementation, run against a yf.download style frame
+    portfolio_values = []
+    for date in data.index:
+        total_value = 0.0
+        for ticker in tickers:
+            try:
+                close_price = data[ticker]['Close'].loc[date]
+                quantity = quantities[ticker]
+                total_value += close_price * quantity
+            except KeyError:
+                pass
+        portfolio_values.append(total_value)
+    return portfolio_values
+
+
+def vectorized_values(closes, deltas):
+    holdings = holdings_over_time(deltas, closes.index, list(closes.columns))
+    return portfolio_values(closes, holdings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tickers', type=int, default=200)
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    closes, quantities, deltas = make_data(args.tickers, args.years)
+    tickers = list(closes.columns)
+    downloaded = pd.concat({t: closes[[t]].rename(columns={t: 'Close'})
+                            for t in tickers}, axis=1)
+
+    expected = np.array(loop_values(downloaded, tickers, quantities))
+    actual = vectorized_values(closes, deltas).to_numpy()
+    assert np.allclose(expected, actual), 'engine disagrees with loop'
+
+    loop = min(timeit.repeat(
+        lambda: loop_values(downloaded, tickers, quantities),
+        number=1, repeat=args.repeat))
+    vectorized = min(timeit.repeat(
+        lambda: vectorized_values(closes, deltas),
+        number=1, repeat=args.repeat))
+
+    print(f'{len(closes)} dates x {len(tickers)} tickers')
+    print(f'loop:       {loop * 1000:10.2f} ms')
+    print(f'vectorized: {vectorized * 1000:10.2f} ms')
+    print(f'speedup:    {loop / vectorized:10.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""Seed a large ledger and report latency and query plans for the SQL
+behind each endpoint.
+
+    python benchmarks/query_plans.py --rows 200000
+    python benchmarks/query_plans.py --rows 1000000 --users 1000
+    python benchmarks/query_plans.py --rows 200000 --no-indexes
+    DATABASE_URL=postgresql://... python benchmarks/query_plans.py
+
+The target database is wiped, so do not point it at real data.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+NEW_INDEXES = ('ix_transaction_user_timestamp',
+               'ix_transaction_user_ticker_timestamp')
+
+# Queries are timed for this user; the others only add rows around it
+USER = 'user-0'
+
+
+def seed(db, Transaction, Preference, rows, tickers, users, chunk=10000):
+    rng = random.Random(0)
+    start = datetime(2015, 1, 2)
+    for offset in range(0, rows, chunk):
+        db.session.execute(db.insert(Transaction), [{
+            'user_id': f'user-{i % users}',
+            'ticker': f'T{rng.randrange(tickers):03d}',
+            'quantity': rng.randint(1, 10),
+            'transaction_type': 'buy' if rng.random() < 0.7 else 'sell',
+            'price': rng.uniform(5, 500),
+            'timestamp': start + timedelta(minutes=i),
+        } for i in range(offset, min(offset + chunk, rows))])
+    db.session.add(Preference(user_id=USER, key='portfolio_balance',
+                              value='1000000'))
+    db.session.add_all(Preference(user_id=USER, key=f'pref_{i}', value=str(i))
+                       for i in range(1000))
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--tickers', type=int, default=200)
+    parser.add_argument('--users', type=int, default=1,
+                        help='spread the rows evenly over this many users')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--no-indexes', action='store_true',
+                        help='drop the access-pattern indexes for comparison')
+    args = parser.parse_args()
+
+    if 'DATABASE_URL' not in os.environ:
+        path = os.path.join(tempfile.mkdtemp(), 'plans.sqlite')
+        os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    os.environ.setdefault('QUOTE_PROVIDER', 'static')
+
+    from app import app
+    from models import db, Transaction, Preference
+    from positions import rebuild_positions, get_holdings, \
+        get_open_positions, get_daily_trade_deltas
+
+    def preference_lookup():
+        return db.session.execute(
+            db.select(Preference).filter_by(key='portfolio_balance',
+                                            user_id=USER)
+        ).scalar_one_or_none()
+
+    cases = [
+        ('/api/portfolio', lambda: get_holdings(USER)),
+        ('/api/portfolio_details', lambda: get_open_positions(USER)),
+        ('/api/portfolio_history', lambda: get_daily_trade_deltas(USER)),
+        ('/api/preference', preference_lookup),
+        ('flask rebuild-positions', lambda: rebuild_positions(USER)),
+    ]
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        if args.no_indexes:
+            for name in NEW_INDEXES:
+                db.session.execute(db.text(f'DROP INDEX {name}'))
+        started = time.monotonic()
+        seed(db, Transaction, Preference, args.rows, args.tickers,
+             args.users)
+        for user in range(args.users):
+            rebuild_positions(f'user-{user}')
+        print(f'seeded {args.rows} transactions in '
+              f'{time.monotonic() - started:.1f}s\n')
+
+        dialect = db.engine.dialect.name
+        explain = 'EXPLAIN QUERY PLAN ' if dialect == 'sqlite' else 'EXPLAIN '
+
+        for label, func in cases:
+            statements = []
+
+            def capture(conn, cursor, statement, parameters, context,
+                        executemany):
+                if statement.lstrip().upper().startswith('SELECT'):
+                    statements.append((statement, parameters))
+
+            timings = []
+            for i in range(args.repeat):
+                if i == 0:
+                    event.listen(db.engine, 'before_cursor_execute', capture)
+                started = time.monotonic()
+                func()
+                timings.append(time.monotonic() - started)
+                if i == 0:
+                    event.remove(db.engine, 'before_cursor_execute', capture)
+                db.session.rollback()
+
+            print(f'{label}: best {min(timings) * 1000:.2f} ms, '
+                  f'median {sorted(timings)[len(timings) // 2] * 1000:.2f} ms')
+            for statement, parameters in statements:
+                print('  ' + ' '.join(statement.split()))
+                with db.engine.connect() as conn:
+                    plan = conn.exec_driver_sql(explain + statement,
+                                                parameters).all()
+                for row in plan:
+                    print('    ' + str(row[-1]))
+            print()
+
+
+if __name__ == '__main__':
+    main()
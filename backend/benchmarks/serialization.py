@@ -0,0 +1,83 @@
+"""Per-request serialization cost of the history payloads.
+
+Compares the old iterrows + json path with the columnar orjson payload
+and the row shape still served with ?shape=rows.
+
+    python benchmarks/serialization.py
+"""
+import json
+import os
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from serialize import JSON_OPTIONS, frame_columns, to_rows  # noqa: E402
+import orjson  # noqa: E402
+
+# Daily bars per range; 'max' is roughly 40 years of a long-listed stock
+RANGES = {'1y': 252, '5y': 1260, 'max': 10000}
+
+COLUMNS = {
+    'open': ('Open', float),
+    'high': ('High', float),
+    'low': ('Low', float),
+    'close': ('Close', float),
+    'volume': ('Volume', np.int64),
+}
+
+
+def make_frame(n, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(rng.normal(0, 0.01, n).cumsum())
+    return pd.DataFrame({
+        'Open': close, 'High': close * 1.01, 'Low': close * 0.99,
+        'Close': close, 'Volume': rng.integers(1e5, 1e7, n).astype(float),
+    }, index=pd.bdate_range(end='2024-12-31', periods=n))
+
+
+def old_path(history):
+    data = []
+    for date, row in history.iterrows():
+        data.append({
+            'date': date.strftime('%Y-%m-%d'),
+            'open': float(row['Open']),
+            'high': float(row['High']),
+            'low': float(row['Low']),
+            'close': float(row['Close']),
+            'volume': int(row['Volume'])
+        })
+    return json.dumps(data).encode()
+
+
+def columnar_path(history):
+    return orjson.dumps(frame_columns(history, COLUMNS), option=JSON_OPTIONS)
+
+
+def rows_path(history):
+    return orjson.dumps(to_rows(frame_columns(history, COLUMNS)),
+                        option=JSON_OPTIONS)
+
+
+def main():
+    print(f'{"range":>6} {"bars":>6} {"iterrows+json":>15} '
+          f'{"rows+orjson":>13} {"columnar":>10} {"bytes old/col":>16}')
+    for name, n in RANGES.items():
+        history = make_frame(n)
+        timings = {}
+        for label, func in (('old', old_path), ('rows', rows_path),
+                            ('columnar', columnar_path)):
+            runs = max(1, 2000 // n)
+            timings[label] = min(timeit.repeat(
+                lambda: func(history), number=runs, repeat=3)) / runs
+        print(f'{name:>6} {n:>6} {timings["old"] * 1000:>12.2f} ms '
+              f'{timings["rows"] * 1000:>10.2f} ms '
+              f'{timings["columnar"] * 1000:>7.2f} ms '
+              f'{len(old_path(history)):>8}/{len(columnar_path(history))}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""Hammer /api/buy and /api/sell from many threads and check that no
+balance or position update was lost.
+
+    python benchmarks/trade_stress.py --threads 16 --trades 200
+    DATABASE_URL=postgresql://... python benchmarks/trade_stress.py
+
+Uses the static quote provider, so no network is needed. The target
+database is wiped, so do not point it at real data.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+PRICES = {'AAPL': 187.25, 'MSFT': 411.1, 'NVDA': 903.5, 'SPY': 512.0}
+INITIAL_BALANCE = 1_000_000.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--trades', type=int, default=100,
+                        help='trades per thread')
+    args = parser.parse_args()
+
+    if 'DATABASE_URL' not in os.environ:
+        path = os.path.join(tempfile.mkdtemp(), 'stress.sqlite')
+        os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    # Background refreshes would skew the measurements
+    os.environ.setdefault('PREWARM', '0')
+    os.environ['QUOTE_PROVIDER'] = 'static'
+
+    from app import app, quote_cache
+    from models import db, Transaction, Preference, Position, DEFAULT_USER
+    from positions import apply_transaction
+
+    quote_cache.provider.quotes.update(
+        {t: {'regularMarketPrice': p} for t, p in PRICES.items()})
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.add(Preference(user_id=DEFAULT_USER,
+                                  key='portfolio_balance',
+                                  value=str(INITIAL_BALANCE)))
+        db.session.commit()
+
+    statuses = {}
+    lock = threading.Lock()
+
+    def trader(seed):
+        rng = random.Random(seed)
+        client = app.test_client()
+        for _ in range(args.trades):
+            side = rng.choice(('buy', 'buy', 'sell'))
+            response = client.post(f'/api/{side}', json={
+                'ticker': rng.choice(list(PRICES)),
+                'quantity': rng.randint(1, 20)})
+            with lock:
+                statuses[response.status_code] = \
+                    statuses.get(response.status_code, 0) + 1
+
+    threads = [threading.Thread(target=trader, args=(i,))
+               for i in range(args.threads)]
+    started = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - started
+
+    with app.app_context():
+        ledger = db.session.execute(
+            db.select(Transaction).order_by(Transaction.timestamp,
+                                            Transaction.id)).scalars().all()
+        expected_balance = INITIAL_BALANCE
+        expected = {}
+        for txn in ledger:
+            sign = -1 if txn.transaction_type == 'buy' else 1
+            expected_balance += sign * txn.price * txn.quantity
+            position = expected.setdefault(
+                txn.ticker, Position(ticker=txn.ticker))
+            apply_transaction(position, txn.transaction_type, txn.quantity,
+                              txn.price, txn.timestamp)
+
+        balance = float(db.session.execute(
+            db.select(Preference.value).filter_by(key='portfolio_balance')
+        ).scalar_one())
+        positions = {p.ticker: p.quantity for p in db.session.execute(
+            db.select(Position)).scalars()}
+        ids = [txn.id for txn in ledger]
+
+    total = args.threads * args.trades
+    print(f'{total} trades in {elapsed:.2f}s '
+          f'({total / elapsed:.1f} trades/sec), statuses {statuses}')
+    print(f'ledger rows: {len(ledger)}, balance: {balance:.2f}, '
+          f'expected: {expected_balance:.2f}')
+
+    failures = []
+    if abs(balance - expected_balance) > 1e-6 * INITIAL_BALANCE:
+        failures.append('balance does not match ledger (lost update)')
+    if balance < 0:
+        failures.append('balance went negative')
+    for ticker, position in expected.items():
+        if positions.get(ticker, 0) != position.quantity:
+            failures.append(f'{ticker} position {positions.get(ticker)} '
+                            f'!= ledger {position.quantity}')
+        if position.quantity < 0:
+            failures.append(f'{ticker} was sold short')
+    if len(set(ids)) != len(ids):
+        failures.append('duplicate transaction ids')
+
+    for failure in failures:
+        print(f'FAIL: {failure}')
+    if failures:
+        sys.exit(1)
+    print('OK: no lost updates')
+
+
+if __name__ == '__main__':
+    main()
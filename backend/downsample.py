@@ -0,0 +1,103 @@
+# downsample.py
+
+import numpy as np
+import pandas as pd
+
+# Bar interval fetched for each chart range, so long ranges never pull
+# more bars than the chart can show
+RANGE_INTERVALS = {
+    '1d': '5m',
+    '5d': '1h',
+    '1mo': '1d',
+    '3mo': '1d',
+    '6mo': '1d',
+    'ytd': '1d',
+    '1y': '1d',
+    '2y': '1wk',
+    '5y': '1wk',
+    '10y': '1mo',
+    'max': '1mo',
+}
+
+INTRADAY_INTERVALS = ('1m', '2m', '5m', '15m', '30m', '60m', '90m', '1h')
+
+DEFAULT_POINTS = 60
+MAX_POINTS = 1000
+# LTTB always keeps the first and last bar and needs one bucket between
+MIN_POINTS = 3
+
+
+def interval_for_range(time_range):
+    return RANGE_INTERVALS.get(time_range, '1d')
+
+
+def ohlc(frame, points):
+    """Merge consecutive bars into `points` buckets.
+
+    Each bucket keeps the first open, highest high, lowest low, last close
+    and total volume, so spikes survive the downsampling.
+    """
+    n = len(frame)
+    if n <= points:
+        return frame[['Open', 'High', 'Low', 'Close', 'Volume']]
+
+    starts = np.arange(points) * n // points
+    ends = np.append(starts[1:], n) - 1
+    # fmax/fmin skip NaNs where maximum/minimum would propagate them
+    high = np.fmax.reduceat(frame['High'].to_numpy(dtype=float), starts)
+    low = np.fmin.reduceat(frame['Low'].to_numpy(dtype=float), starts)
+    volume = np.add.reduceat(
+        frame['Volume'].fillna(0).to_numpy(dtype=float), starts)
+    return pd.DataFrame({
+        'Open': frame['Open'].to_numpy(dtype=float)[starts],
+        'High': high,
+        'Low': low,
+        'Close': frame['Close'].to_numpy(dtype=float)[ends],
+        'Volume': volume,
+    }, index=frame.index[starts])
+
+
+def lttb(frame, points, column='Close'):
+    """Largest-Triangle-Three-Buckets selection of `points` rows.
+
+    Picks real bars that best preserve the shape of `column`, which suits
+    line charts better than averaged buckets.
+    """
+    n = len(frame)
+    if n <= points:
+        return frame[['Open', 'High', 'Low', 'Close', 'Volume']]
+
+    y = frame[column].to_numpy(dtype=float)
+    x = np.arange(n, dtype=float)
+    every = (n - 2) / (points - 2)
+    selected = np.empty(points, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+
+    a = 0
+    for i in range(points - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[end:next_end].mean()
+        avg_y = np.nanmean(y[end:next_end]) \
+            if not np.isnan(y[end:next_end]).all() else y[a]
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) -
+                      (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(np.nan_to_num(area, nan=-1.0)))
+        selected[i + 1] = a
+
+    return frame.iloc[selected][['Open', 'High', 'Low', 'Close', 'Volume']]
+
+
+MODES = {
+    'ohlc': ohlc,
+    'lttb': lttb,
+}
+
+
+def downsample(frame, points=DEFAULT_POINTS, mode='ohlc'):
+    if mode not in MODES:
+        raise ValueError(f'Unknown downsampling mode {mode}')
+    if points < MIN_POINTS:
+        raise ValueError(f'points must be at least {MIN_POINTS}')
+    return MODES[mode](frame, points)
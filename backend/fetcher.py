@@ -0,0 +1,31 @@
+# fetcher.py
+
+from concurrent.futures import ThreadPoolExecutor
+import os
+import time
+
+# Every upstream call (yfinance quotes and history) runs on this pool, so
+# its size is the global cap on concurrent upstream requests
+UPSTREAM_CONCURRENCY = int(os.environ.get('UPSTREAM_CONCURRENCY', 16))
+
+executor = ThreadPoolExecutor(max_workers=UPSTREAM_CONCURRENCY,
+                              thread_name_prefix='upstream')
+
+
+class UpstreamTimeout(Exception):
+    pass
+
+
+class Deadline:
+    """Time budget for the upstream calls made by one request."""
+
+    def __init__(self, seconds):
+        self.expires = None if seconds is None else time.monotonic() + seconds
+
+    def remaining(self):
+        if self.expires is None:
+            return None
+        return max(0.0, self.expires - time.monotonic())
+
+    def expired(self):
+        return self.expires is not None and time.monotonic() >= self.expires
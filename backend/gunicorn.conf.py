@@ -0,0 +1,38 @@
+# gunicorn.conf.py
+
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+# Threaded workers: handlers mostly wait on the database and yfinance
+worker_class = 'gthread'
+workers = int(os.environ.get(
+    'WEB_WORKERS', min(multiprocessing.cpu_count() * 2 + 1, 8)))
+threads = int(os.environ.get('WEB_THREADS', 4))
+
+# Import the app once in the master so workers fork with it loaded
+preload_app = os.environ.get('WEB_PRELOAD', '1') == '1'
+
+timeout = int(os.environ.get('WEB_TIMEOUT', 30))
+keepalive = 5
+accesslog = '-' if os.environ.get('WEB_ACCESS_LOG') == '1' else None
+
+
+def post_fork(server, worker):
+    # Connections must not be shared across forked workers. close=False
+    # only drops the child's references to the pool; closing them here
+    # would shut the parent's connections too
+    if preload_app:
+        from app import app
+        from models import db
+        with app.app_context():
+            db.engine.dispose(close=False)
+
+
+def post_worker_init(worker):
+    # Warm caches now rather than on the worker's first request
+    from app import prewarmer
+    if prewarmer:
+        # The upstream rate is shared between the workers
+        prewarmer.start(workers=worker.cfg.workers)
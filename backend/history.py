@@ -0,0 +1,452 @@
+# history.py
+
+from datetime import datetime, timedelta
+import logging
+import os
+import threading
+import zlib
+
+import numpy as np
+import pandas as pd
+from sqlalchemy.dialects import postgresql, sqlite
+
+import fetcher
+import metrics
+from models import db, PriceBar, PriceSeries
+
+logger = logging.getLogger(__name__)
+
+# Column names as returned by yfinance, mapped to PriceBar attributes
+COLUMNS = {
+    'Open': 'open',
+    'High': 'high',
+    'Low': 'low',
+    'Close': 'close',
+    'Adj Close': 'adj_close',
+    'Volume': 'volume',
+}
+
+PERIOD_DAYS = {
+    '1d': 7,
+    '5d': 10,
+    '1mo': 31,
+    '3mo': 92,
+    '6mo': 183,
+    '1y': 366,
+    '2y': 731,
+    '5y': 1827,
+    '10y': 3653,
+}
+
+# Workers and the prewarmer can sync the same ticker at once, so bars and
+# series rows are written with upserts rather than plain inserts
+INSERTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+UPSERT_CHUNK = 1000
+
+# Short periods are counted in trading days rather than calendar days
+PERIOD_TRADING_DAYS = {'1d': 1, '5d': 5}
+
+EARLIEST = datetime(1970, 1, 1)
+
+# Synthetic series all start here, so a ticker's bars come out the same
+# whatever range is asked for
+SYNTHETIC_ORIGIN = datetime(2000, 1, 3)
+
+INTRADAY_MINUTES = {
+    '1m': 1, '2m': 2, '5m': 5, '15m': 15, '30m': 30,
+    '60m': 60, '90m': 90, '1h': 60,
+}
+# Bars longer than a day are resampled from the daily ones
+RESAMPLE_RULES = {'1wk': 'W-MON', '1mo': 'MS', '3mo': 'QS'}
+
+
+def period_start(period, now=None):
+    now = now or datetime.utcnow()
+    today = datetime(now.year, now.month, now.day)
+    if period == 'max':
+        return EARLIEST
+    if period == 'ytd':
+        return datetime(now.year, 1, 1)
+    if period not in PERIOD_DAYS:
+        raise ValueError(f'Unsupported period {period}')
+    return today - timedelta(days=PERIOD_DAYS[period])
+
+
+def _naive_index(frame):
+    if getattr(frame.index, 'tz', None) is not None:
+        frame = frame.copy()
+        frame.index = frame.index.tz_localize(None)
+    return frame
+
+
+class HistoryProvider:
+    """Upstream source of OHLCV bars."""
+
+    def fetch(self, tickers, start, end, interval):
+        """Return {ticker: DataFrame} of bars with start <= date < end."""
+        raise NotImplementedError
+
+
+class YFinanceHistoryProvider(HistoryProvider):
+    def fetch(self, tickers, start, end, interval):
+        import yfinance as yf
+        data = yf.download(tickers=tickers, start=start, end=end,
+                           interval=interval, group_by='ticker',
+                           auto_adjust=False, progress=False)
+        frames = {}
+        for ticker in tickers:
+            if isinstance(data.columns, pd.MultiIndex):
+                if ticker not in data.columns.get_level_values(0):
+                    continue
+                frame = data[ticker]
+            else:
+                frame = data
+            frames[ticker] = _naive_index(frame.dropna(how='all'))
+        return frames
+
+
+def _synthetic_daily(ticker, end):
+    # A seeded random walk: the draws for a day only depend on the ticker
+    # and how many trading days it is past the origin
+    seed = zlib.crc32(ticker.upper().encode())
+    # np.is_busday is far quicker than pd.bdate_range over decades
+    days = np.arange(np.datetime64(SYNTHETIC_ORIGIN, 'D'),
+                     np.datetime64(pd.Timestamp(end).ceil('D'), 'D'))
+    days = pd.DatetimeIndex(days[np.is_busday(days)])
+    rng = np.random.default_rng(seed)
+    n = len(days)
+    returns = rng.normal(0.0001, 0.02, n)
+    base = 20 + seed % 480
+    close = base * np.exp(np.cumsum(returns))
+    noise = np.random.default_rng([seed, 1]).random((3, n))
+    open_ = np.concatenate(([base], close[:-1])) * (1 + (noise[0] - 0.5) / 100)
+    high = np.maximum(open_, close) * (1 + noise[1] / 100)
+    low = np.minimum(open_, close) * (1 - noise[2] / 100)
+    volume = np.random.default_rng([seed, 2]).integers(
+        100_000, 10_000_000, n)
+    return pd.DataFrame({'Open': open_, 'High': high, 'Low': low,
+                         'Close': close, 'Adj Close': close,
+                         'Volume': volume}, index=days)
+
+
+def synthetic_closes(ticker, end):
+    """Daily closes of the synthetic series for dates before `end`."""
+    return _synthetic_daily(ticker, end)['Close']
+
+
+def synthetic_bars(ticker, start, end, interval='1d'):
+    """Made-up but deterministic OHLCV bars with start <= date < end."""
+    daily = _synthetic_daily(ticker, end)
+    if interval in RESAMPLE_RULES:
+        daily = daily.resample(RESAMPLE_RULES[interval], label='left',
+                               closed='left').agg({
+            'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last',
+            'Adj Close': 'last', 'Volume': 'sum'}).dropna()
+    elif interval in INTRADAY_MINUTES:
+        daily = _synthetic_intraday(
+            ticker, daily[daily.index >= pd.Timestamp(start).normalize()],
+            INTRADAY_MINUTES[interval])
+    elif interval != '1d':
+        raise ValueError(f'Unsupported interval {interval}')
+    return daily[(daily.index >= start) & (daily.index < end)]
+
+
+def _synthetic_intraday(ticker, daily, minutes):
+    # Each day walks from its open to its close in `minutes` steps
+    frames = []
+    seed = zlib.crc32(ticker.upper().encode())
+    for day, bar in daily.iterrows():
+        times = pd.date_range(day + timedelta(hours=9, minutes=30),
+                              day + timedelta(hours=16),
+                              freq=f'{minutes}min', inclusive='left')
+        rng = np.random.default_rng([seed, day.toordinal()])
+        steps = np.linspace(bar['Open'], bar['Close'], len(times) + 1)
+        steps[1:-1] *= 1 + rng.normal(0, 0.002, len(times) - 1)
+        spread = 1 + rng.random(len(times)) / 500
+        frames.append(pd.DataFrame({
+            'Open': steps[:-1],
+            'High': np.maximum(steps[:-1], steps[1:]) * spread,
+            'Low': np.minimum(steps[:-1], steps[1:]) / spread,
+            'Close': steps[1:],
+            'Adj Close': steps[1:],
+            'Volume': rng.integers(1_000, 100_000, len(times)),
+        }, index=times))
+    if not frames:
+        return daily.iloc[:0]
+    return pd.concat(frames)
+
+
+class ReplayHistoryProvider(HistoryProvider):
+    """Serves bars recorded under `directory`/history/<interval>/<TICKER>.csv,
+    and synthetic ones for other tickers when `synthetic` is set."""
+
+    def __init__(self, directory=None, synthetic=None):
+        self.directory = directory or os.environ.get('REPLAY_DIR', 'fixtures')
+        if synthetic is None:
+            synthetic = os.environ.get('REPLAY_SYNTHETIC', '1') == '1'
+        self.synthetic = synthetic
+
+    def path(self, ticker, interval):
+        return os.path.join(self.directory, 'history', interval,
+                            f'{ticker.upper()}.csv')
+
+    def fetch(self, tickers, start, end, interval):
+        frames = {}
+        for ticker in tickers:
+            path = self.path(ticker, interval)
+            if os.path.exists(path):
+                frame = pd.read_csv(path, index_col=0, parse_dates=True)
+                frames[ticker] = frame[(frame.index >= start) &
+                                       (frame.index < end)]
+            elif self.synthetic:
+                frames[ticker] = synthetic_bars(ticker, start, end, interval)
+        return frames
+
+
+class RecordingHistoryProvider(ReplayHistoryProvider):
+    """Passes fetches to yfinance and merges the bars into replay fixtures."""
+
+    def __init__(self, directory=None, provider=None):
+        super().__init__(directory, synthetic=False)
+        self.provider = provider or YFinanceHistoryProvider()
+        self._lock = threading.Lock()
+
+    def fetch(self, tickers, start, end, interval):
+        frames = self.provider.fetch(tickers, start, end, interval)
+        with self._lock:
+            for ticker, frame in frames.items():
+                path = self.path(ticker, interval)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                if os.path.exists(path):
+                    stored = pd.read_csv(path, index_col=0, parse_dates=True)
+                    frame = pd.concat([stored, frame])
+                    frame = frame[~frame.index.duplicated(keep='last')]
+                frame.sort_index().to_csv(path, index_label='Date')
+        return frames
+
+
+class HistoryStore:
+    """OHLCV bars served from the PriceBar table.
+
+    Only the bars missing since the last stored date (or before the first
+    one) are fetched upstream; if the upstream fails or does not answer
+    within the timeout the stored bars are served as they are.
+    """
+
+    def __init__(self, provider, refresh_interval=900, executor=None):
+        self.provider = provider
+        self.refresh_interval = timedelta(seconds=refresh_interval)
+        self.executor = executor or fetcher.executor
+
+    def sync(self, tickers, start, interval='1d', now=None, timeout=None):
+        """Fill missing bars. Returns the tickers that could not be
+        refreshed and are being served from stored bars only."""
+        now = now or datetime.utcnow()
+        end = datetime(now.year, now.month, now.day) + timedelta(days=1)
+        series = {
+            s.ticker: s for s in db.session.execute(
+                db.select(PriceSeries).filter(
+                    PriceSeries.ticker.in_(tickers),
+                    PriceSeries.interval == interval)
+            ).scalars()
+        }
+
+        # Group tickers by the gap that needs filling so each distinct
+        # range costs one upstream call
+        gaps = {}
+        for ticker in tickers:
+            s = series.get(ticker)
+            if s is None or s.first_date is None:
+                gaps.setdefault((start, end), []).append(ticker)
+                continue
+            if start < s.first_date:
+                gaps.setdefault((start, s.first_date), []).append(ticker)
+            outdated = s.fetched_at is None or \
+                now - s.fetched_at >= self.refresh_interval
+            if outdated and s.last_date is not None:
+                # Refetch the last stored bar too, it may have been partial
+                gaps.setdefault((s.last_date, end), []).append(ticker)
+            elif outdated:
+                gaps.setdefault((s.first_date, end), []).append(ticker)
+
+        # Fetch all gaps concurrently on the shared upstream pool
+        futures = {
+            gap: self.executor.submit(
+                self._fetch, gap_tickers, gap[0], gap[1], interval)
+            for gap, gap_tickers in gaps.items()
+        }
+        deadline = fetcher.Deadline(timeout)
+        stale = set()
+        for (gap_start, gap_end), gap_tickers in gaps.items():
+            try:
+                with metrics.phase('upstream'):
+                    frames = futures[(gap_start, gap_end)].result(
+                        deadline.remaining())
+            except Exception as e:
+                logger.warning(
+                    f'History fetch failed for {gap_tickers}, serving '
+                    f'stored bars: {e!r}')
+                stale.update(gap_tickers)
+                continue
+
+            for ticker in gap_tickers:
+                frame = frames.get(ticker)
+                if frame is None or not len(frame):
+                    # yfinance reports failures as missing or empty data.
+                    # Keep what is stored and leave the series outdated so
+                    # the next request retries
+                    logger.warning(
+                        f'No history returned for {ticker}, serving '
+                        f'stored bars')
+                    stale.add(ticker)
+                    continue
+                self._store(ticker, interval, gap_start, gap_end, frame)
+                s = series.get(ticker)
+                if s is None:
+                    s = series[ticker] = self._new_series(ticker, interval)
+                s.first_date = min(s.first_date or gap_start, gap_start)
+                last_bar = frame.index.max().to_pydatetime()
+                s.last_date = max(s.last_date or last_bar, last_bar)
+                s.fetched_at = now
+
+        if gaps:
+            db.session.commit()
+        return stale
+
+    def version(self, tickers, start, interval='1d', now=None):
+        """(token, last_modified) identifying the stored bars of `tickers`
+        from `start`, or None if sync() would go upstream for any of them
+        and the bars may be about to change."""
+        now = now or datetime.utcnow()
+        series = {
+            s.ticker: s for s in db.session.execute(
+                db.select(PriceSeries).filter(
+                    PriceSeries.ticker.in_(tickers),
+                    PriceSeries.interval == interval)
+            ).scalars()
+        }
+        token = []
+        for ticker in sorted(tickers):
+            s = series.get(ticker)
+            # Same checks as sync() uses to find gaps
+            if s is None or s.first_date is None or start < s.first_date or \
+                    s.fetched_at is None or \
+                    now - s.fetched_at >= self.refresh_interval:
+                return None
+            token.append((ticker, s.first_date, s.last_date, s.fetched_at))
+        last_modified = max((t[3] for t in token), default=None)
+        return tuple(token), last_modified
+
+    def _fetch(self, tickers, start, end, interval):
+        with metrics.upstream_call('history'):
+            return self.provider.fetch(tickers, start, end, interval)
+
+    def _new_series(self, ticker, interval):
+        # Another process may have created the row since we looked
+        insert = INSERTS[db.engine.dialect.name]
+        db.session.execute(
+            insert(PriceSeries).values(ticker=ticker, interval=interval)
+            .on_conflict_do_nothing(
+                index_elements=[PriceSeries.ticker, PriceSeries.interval]))
+        return db.session.get(PriceSeries, (ticker, interval),
+                              populate_existing=True)
+
+    def _store(self, ticker, interval, start, end, frame):
+        # The fetched bars replace whatever was stored for the gap
+        db.session.execute(
+            db.delete(PriceBar).filter(
+                PriceBar.ticker == ticker,
+                PriceBar.interval == interval,
+                PriceBar.date >= start,
+                PriceBar.date < end)
+        )
+
+        frame = frame[[c for c in COLUMNS if c in frame.columns]]
+        frame = frame.astype(object).where(frame.notna(), None)
+        rows = []
+        for date, values in zip(frame.index, frame.itertuples(index=False)):
+            row = {'ticker': ticker, 'interval': interval,
+                   'date': date.to_pydatetime()}
+            for column, value in zip(frame.columns, values):
+                row[COLUMNS[column]] = value
+            if row.get('volume') is not None:
+                row['volume'] = int(row['volume'])
+            rows.append(row)
+        insert = INSERTS[db.engine.dialect.name]
+        # Chunked to stay under the drivers' bound parameter limits
+        for i in range(0, len(rows), UPSERT_CHUNK):
+            stmt = insert(PriceBar).values(rows[i:i + UPSERT_CHUNK])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[PriceBar.ticker, PriceBar.interval,
+                                PriceBar.date],
+                set_={column: stmt.excluded[column]
+                      for column in COLUMNS.values()})
+            db.session.execute(stmt)
+
+    def load(self, tickers, start, interval='1d'):
+        rows = db.session.execute(
+            db.select(PriceBar.ticker, PriceBar.date, PriceBar.open,
+                      PriceBar.high, PriceBar.low, PriceBar.close,
+                      PriceBar.adj_close, PriceBar.volume)
+            .filter(PriceBar.ticker.in_(tickers),
+                    PriceBar.interval == interval,
+                    PriceBar.date >= start)
+            .order_by(PriceBar.date)
+        ).all()
+        return pd.DataFrame(rows, columns=['Ticker', 'Date'] + list(COLUMNS))
+
+    def get_history(self, ticker, period='1mo', interval='1d', timeout=None):
+        """OHLCV bars for one ticker, shaped like yf.Ticker.history().
+
+        frame.attrs['stale'] is set when the bars could not be refreshed.
+        """
+        ticker = ticker.upper()
+        start = period_start(period)
+        stale = self.sync([ticker], start, interval, timeout=timeout)
+        frame = self.load([ticker], start, interval)
+        frame = frame.drop(columns='Ticker').set_index('Date')
+        frame.index = pd.DatetimeIndex(frame.index)
+        if period in PERIOD_TRADING_DAYS and len(frame):
+            days = frame.index.normalize()
+            first_day = days.unique()[-PERIOD_TRADING_DAYS[period]:][0]
+            frame = frame[days >= first_day]
+        frame.attrs['stale'] = bool(stale)
+        return frame
+
+    def get_closes(self, tickers, period='1y', interval='1d', timeout=None,
+                   start=None):
+        """Close prices as a date x ticker DataFrame, from `start` if
+        given rather than the start of `period`.
+
+        frame.attrs['stale'] lists the tickers that could not be refreshed.
+        """
+        tickers = sorted({t.upper() for t in tickers})
+        if not tickers:
+            return pd.DataFrame()
+        start = start or period_start(period)
+        stale = self.sync(tickers, start, interval, timeout=timeout)
+        frame = self.load(tickers, start, interval)
+        closes = frame.pivot(index='Date', columns='Ticker', values='Close')
+        closes.index = pd.DatetimeIndex(closes.index)
+        closes = closes.reindex(columns=tickers)
+        closes.attrs['stale'] = sorted(stale)
+        return closes
+
+
+PROVIDERS = {
+    'yfinance': YFinanceHistoryProvider,
+    'replay': ReplayHistoryProvider,
+    'record': RecordingHistoryProvider,
+}
+
+
+def create_history_store(provider=None):
+    if provider is None:
+        provider = PROVIDERS[os.environ.get('HISTORY_PROVIDER', 'yfinance')]()
+    return HistoryStore(
+        provider,
+        refresh_interval=float(os.environ.get('HISTORY_REFRESH', 900)),
+    )
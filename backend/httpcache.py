@@ -0,0 +1,104 @@
+# httpcache.py
+
+import calendar
+import gzip
+import hashlib
+import os
+
+from flask import Response, request
+
+import metrics
+
+try:
+    import brotli
+except ImportError:
+    # Optional; without it clients get gzip
+    brotli = None
+
+# Bodies smaller than this aren't worth the CPU or the extra header
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+# Fast settings: these are dynamic responses, not static assets
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 5
+
+COMPRESSIBLE = ('application/json', 'text/')
+
+# Encoded bodies get their own strong ETag, e.g. "abc-br"
+ENCODINGS = ('br', 'gzip')
+
+# Per-user data must be revalidated, since trades change it at any time
+PRIVATE = 'private, no-cache'
+
+
+def make_etag(*parts):
+    """A strong ETag from the versions a response was built from."""
+    return hashlib.sha1(repr(parts).encode()).hexdigest()[:32]
+
+
+def not_modified(etag, last_modified=None):
+    """True if the client already has this version (If-None-Match, or
+    If-Modified-Since when no ETag was sent)."""
+    if request.if_none_match:
+        return any(request.if_none_match.contains(tag) for tag in
+                   [etag] + [f'{etag}-{e}' for e in ENCODINGS])
+    since = request.if_modified_since
+    if since is not None and last_modified is not None:
+        # HTTP dates only have whole seconds; last_modified is naive UTC
+        return calendar.timegm(last_modified.utctimetuple()) <= \
+            int(since.timestamp())
+    return False
+
+
+def validators(response, etag, cache_control, last_modified=None,
+               vary=None):
+    """Set ETag, Last-Modified and Cache-Control on a response."""
+    if etag is not None:
+        response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = cache_control
+    if vary:
+        response.vary.add(vary)
+    return response
+
+
+def not_modified_response(etag, cache_control, last_modified=None,
+                          vary=None):
+    return validators(Response(status=304), etag, cache_control,
+                      last_modified, vary)
+
+
+def _encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress_response(response):
+    """Gzip or brotli-compress large JSON and text bodies (after_request)."""
+    if response.direct_passthrough or response.is_streamed or \
+            response.status_code != 200 or \
+            'Content-Encoding' in response.headers or \
+            not (response.mimetype or '').startswith(COMPRESSIBLE):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = _encoding()
+    if encoding is None or \
+            (response.content_length or 0) < COMPRESS_MIN_SIZE:
+        return response
+
+    with metrics.phase('serialize'):
+        body = response.get_data()
+        if encoding == 'br':
+            body = brotli.compress(body, quality=BROTLI_QUALITY)
+        else:
+            body = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(f'{etag}-{encoding}')
+    return response
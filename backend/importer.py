@@ -0,0 +1,158 @@
+# importer.py
+
+import csv
+from datetime import datetime, timezone
+import io
+import json
+import math
+
+from models import db, Transaction
+from positions import rebuild_positions, Oversold
+
+CHUNK_SIZE = 5000
+MAX_ERRORS = 100
+
+# Accepted spellings of each column in broker exports
+ALIASES = {
+    'ticker': ('ticker', 'symbol'),
+    'quantity': ('quantity', 'qty', 'shares'),
+    'transaction_type': ('transaction_type', 'side', 'type', 'action'),
+    'price': ('price',),
+    'timestamp': ('timestamp', 'date', 'time', 'datetime'),
+}
+
+
+class TradeImportError(Exception):
+    def __init__(self, message, errors=None):
+        super().__init__(message)
+        self.errors = errors or []
+
+
+def _field(record, name):
+    for alias in ALIASES[name]:
+        value = record.get(alias)
+        if value not in (None, ''):
+            return value
+    return None
+
+
+def parse_row(record):
+    """Validate one raw record and return Transaction column values."""
+    ticker = _field(record, 'ticker')
+    if not ticker or len(str(ticker).strip()) > 10:
+        raise ValueError('ticker is missing or longer than 10 characters')
+
+    side = str(_field(record, 'transaction_type') or '').strip().lower()
+    if side not in ('buy', 'sell'):
+        raise ValueError("side must be 'buy' or 'sell'")
+
+    # float() accepts 'inf', 'nan' and overflows like '1e400' to inf
+    quantity = float(_field(record, 'quantity') or 0)
+    if not math.isfinite(quantity) or quantity <= 0 or \
+            not quantity.is_integer():
+        raise ValueError('quantity must be a positive whole number')
+
+    price = float(_field(record, 'price') or 0)
+    if not math.isfinite(price) or price <= 0:
+        raise ValueError('price must be a positive number')
+
+    raw_timestamp = _field(record, 'timestamp')
+    if raw_timestamp is None:
+        raise ValueError('timestamp is missing')
+    timestamp = datetime.fromisoformat(str(raw_timestamp).strip())
+    if timestamp.tzinfo is not None:
+        # The ledger stores naive UTC
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+
+    return {
+        'ticker': str(ticker).strip().upper(),
+        'quantity': int(quantity),
+        'transaction_type': side,
+        'price': price,
+        'timestamp': timestamp,
+    }
+
+
+def read_records(stream, fmt):
+    """Yield raw dict records from a binary stream, one line at a time.
+
+    Lines that cannot be decoded are yielded as the exception instead.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        for record in csv.DictReader(text):
+            yield {k.strip().lower(): v for k, v in record.items() if k}
+    elif fmt == 'ndjson':
+        for line in text:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                # Reported against the row instead of aborting the stream
+                yield e
+                continue
+            yield {k.lower(): v for k, v in record.items()}
+    else:
+        raise TradeImportError(f'Unsupported format {fmt}')
+
+
+def import_transactions(stream, fmt, user_id, chunk_size=CHUNK_SIZE):
+    """Stream trades into the user's ledger in one all-or-nothing
+    transaction.
+
+    Rows are validated and bulk inserted a chunk at a time so memory stays
+    flat; positions are rebuilt once at the end. Any invalid row, or a sell
+    of more shares than the merged ledger held at that time, rolls the
+    whole import back.
+    """
+    errors = []
+    chunk = []
+    imported = 0
+
+    def flush():
+        nonlocal imported
+        if chunk and not errors:
+            db.session.execute(db.insert(Transaction), chunk)
+            imported += len(chunk)
+        chunk.clear()
+
+    try:
+        for line, record in enumerate(read_records(stream, fmt), start=1):
+            try:
+                if isinstance(record, Exception):
+                    raise record
+                row = parse_row(record)
+                row['user_id'] = user_id
+                chunk.append(row)
+            except (ValueError, TypeError, AttributeError,
+                    OverflowError) as e:
+                errors.append({'row': line, 'error': str(e)})
+                if len(errors) >= MAX_ERRORS:
+                    break
+            if len(chunk) >= chunk_size:
+                flush()
+        flush()
+
+        if errors:
+            raise TradeImportError(f'{len(errors)} invalid rows, nothing imported',
+                               errors)
+        if not imported:
+            raise TradeImportError('No rows to import')
+
+        try:
+            # Imported rows can land anywhere in the existing ledger, so
+            # sells are checked while replaying the merged one
+            positions = rebuild_positions(user_id, commit=False,
+                                          check_oversells=True)
+        except Oversold as e:
+            raise TradeImportError(f'{e}, nothing imported',
+                                   [{'ticker': e.ticker,
+                                     'timestamp': e.timestamp.isoformat(),
+                                     'error': str(e)}])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return {'imported': imported, 'positions': positions}
@@ -0,0 +1,257 @@
+# insights.py
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import hashlib
+import os
+import threading
+import time
+
+from cache import TTLCache
+import metrics
+from models import db, InsightJob
+from preferences import INSERTS
+
+SYSTEM_MESSAGE = """
+    Give me exactly three bullet points of the following structure:
+
+    1. Provide a brief description of the portfolios success in no longer than one sentence. 
+    2. Provide a brief description of the portfolios shortcomings in no longer that one sentence
+    3. Give some stock recommendations based on the current holdings, P&L, etc. in no longer than one sentence
+    """
+
+
+class RateLimited(Exception):
+    pass
+
+
+class LLMClient:
+    """Chat completion backend used by InsightsService."""
+
+    model = None
+
+    def complete(self, messages):
+        raise NotImplementedError
+
+
+class OpenAIClient(LLMClient):
+    def __init__(self, model='gpt-3.5-turbo', api_key=None):
+        self.model = model
+        self.api_key = api_key or os.environ.get('OPENAI_API_KEY')
+
+    def complete(self, messages):
+        import openai
+        response = openai.ChatCompletion.create(
+            model=self.model,
+            messages=messages,
+            api_key=self.api_key
+        )
+        return response['choices'][0]['message']['content']
+
+
+class FakeLLMClient(LLMClient):
+    """Canned local responses for tests and latency benchmarks."""
+
+    model = 'fake'
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+
+    def complete(self, messages):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        digest = hashlib.sha256(messages[-1]['content'].encode()).hexdigest()
+        return f'- Summary for portfolio {digest[:8]}'
+
+
+class TokenBudget:
+    """Token bucket over requests and estimated tokens per minute."""
+
+    def __init__(self, requests_per_minute, tokens_per_minute,
+                 clock=time.monotonic):
+        self.limits = (requests_per_minute, tokens_per_minute)
+        self.available = list(self.limits)
+        self.clock = clock
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def take(self, tokens):
+        with self._lock:
+            now = self.clock()
+            elapsed = now - self.updated
+            self.updated = now
+            for i, limit in enumerate(self.limits):
+                self.available[i] = min(
+                    limit, self.available[i] + elapsed * limit / 60.0)
+            if self.available[0] < 1 or self.available[1] < tokens:
+                return False
+            self.available[0] -= 1
+            self.available[1] -= tokens
+            return True
+
+
+def estimate_tokens(messages, completion_tokens=200):
+    # Roughly four characters per token, plus room for the reply
+    return sum(len(m['content']) for m in messages) // 4 + completion_tokens
+
+
+class Job:
+    """Snapshot of an InsightJob row; its id is the request hash."""
+
+    def __init__(self, key, status='pending', result=None, error=None):
+        self.id = self.key = key
+        self.status = status
+        self.result = result
+        self.error = error
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(row.key, row.status, row.result, row.error)
+
+    def to_dict(self):
+        return {'job_id': self.id, 'status': self.status,
+                'response': self.result, 'error': self.error}
+
+
+class InsightsService:
+    """Cached, deduplicated and rate limited LLM portfolio summaries.
+
+    Generation runs on a small background pool. Jobs and answers live in
+    the InsightJob table keyed by request hash, so identical requests share
+    one job while it runs and one answer afterwards whichever worker they
+    reach. Finished answers are also kept in a small per-process cache.
+    A job still pending after `job_ttl` seconds (its worker died) is
+    started again by the next request.
+    """
+
+    def __init__(self, app, client, ttl=3600, concurrency=2,
+                 requests_per_minute=20, tokens_per_minute=40000,
+                 job_ttl=600):
+        self.app = app
+        self.client = client
+        self.ttl = ttl
+        self.cache = TTLCache(maxsize=256, ttl=ttl)
+        self.budget = TokenBudget(requests_per_minute, tokens_per_minute)
+        self.executor = ThreadPoolExecutor(max_workers=concurrency,
+                                           thread_name_prefix='insights')
+        self.job_ttl = job_ttl
+
+    def messages(self, user_message):
+        return [
+            {"role": "system", "content": SYSTEM_MESSAGE},
+            {"role": "user", "content": user_message}
+        ]
+
+    def key(self, user_message):
+        return hashlib.sha256(
+            f'{self.client.model}\0{SYSTEM_MESSAGE}\0{user_message}'.encode()
+        ).hexdigest()
+
+    def ask(self, user_message):
+        """Return a finished Job from cache, or the pending Job for it.
+
+        Raises RateLimited when a new generation would exceed the budget.
+        """
+        key = self.key(user_message)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return Job(key, 'done', cached)
+
+        now = datetime.utcnow()
+        row = db.session.get(InsightJob, key, populate_existing=True)
+        if row is not None and not self._reusable(row, now):
+            row = None
+        if row is not None:
+            if row.status == 'done':
+                self.cache.put(key, row.result)
+            return Job.from_row(row)
+
+        if not self._claim(key, now):
+            # Another worker started it first; join that job
+            return self.job(key) or Job(key)
+        # Only a generation that is actually started is charged
+        messages = self.messages(user_message)
+        if not self.budget.take(estimate_tokens(messages)):
+            error = 'AI request budget exhausted, try again later'
+            # Failed jobs are claimed again by the next request
+            self._finish(key, {'status': 'error', 'error': error})
+            raise RateLimited(error)
+        self.executor.submit(self._run, key, messages)
+        return Job(key)
+
+    def job(self, job_id):
+        row = db.session.get(InsightJob, job_id, populate_existing=True)
+        if row is None or not self._reusable(row, datetime.utcnow()):
+            return None
+        return Job.from_row(row)
+
+    def _reusable(self, row, now):
+        """False for failed, expired or abandoned jobs, which are rerun."""
+        if row.status == 'done':
+            return row.finished_at >= now - timedelta(seconds=self.ttl)
+        if row.status == 'pending':
+            return row.created_at >= now - timedelta(seconds=self.job_ttl)
+        return False
+
+    def _claim(self, key, now):
+        """Insert a pending job, or restart one that isn't reusable; False
+        if another worker holds a live one."""
+        values = {'status': 'pending', 'result': None, 'error': None,
+                  'created_at': now, 'finished_at': None}
+        insert = INSERTS[db.engine.dialect.name]
+        stmt = insert(InsightJob).values(key=key, **values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[InsightJob.key], set_=values,
+            where=db.or_(
+                InsightJob.status == 'error',
+                db.and_(InsightJob.status == 'done',
+                        InsightJob.finished_at <
+                        now - timedelta(seconds=self.ttl)),
+                db.and_(InsightJob.status == 'pending',
+                        InsightJob.created_at <
+                        now - timedelta(seconds=self.job_ttl))))
+        claimed = db.session.execute(stmt).rowcount > 0
+        if claimed:
+            # Old answers nobody asked for again
+            db.session.execute(db.delete(InsightJob).filter(
+                InsightJob.status != 'pending',
+                InsightJob.finished_at < now - timedelta(seconds=self.ttl)))
+        db.session.commit()
+        return claimed
+
+    def _run(self, key, messages):
+        try:
+            with metrics.upstream_call('llm'):
+                result = self.client.complete(messages)
+            self.cache.put(key, result)
+            values = {'status': 'done', 'result': result}
+        except Exception as e:
+            values = {'status': 'error', 'error': str(e)}
+        with self.app.app_context():
+            self._finish(key, values)
+
+    def _finish(self, key, values):
+        db.session.execute(
+            db.update(InsightJob).filter(InsightJob.key == key)
+            .values(finished_at=datetime.utcnow(), **values))
+        db.session.commit()
+
+
+CLIENTS = {
+    'openai': OpenAIClient,
+    'fake': FakeLLMClient,
+}
+
+
+def create_insights_service(app, client=None):
+    if client is None:
+        client = CLIENTS[os.environ.get('LLM_CLIENT', 'openai')]()
+    return InsightsService(
+        app, client,
+        ttl=float(os.environ.get('INSIGHTS_TTL', 3600)),
+        concurrency=int(os.environ.get('INSIGHTS_CONCURRENCY', 2)),
+        requests_per_minute=float(os.environ.get('INSIGHTS_RPM', 20)),
+        tokens_per_minute=float(os.environ.get('INSIGHTS_TPM', 40000)),
+    )
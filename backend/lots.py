@@ -0,0 +1,223 @@
+# lots.py
+
+from collections import OrderedDict, deque
+import threading
+
+from models import db, Transaction
+from positions import get_ledger_version
+
+METHODS = ('fifo', 'lifo', 'average')
+
+# Sells kept per ticker for the report; realized P&L covers all of them.
+# Books live as long as the worker, so the full list would grow with the
+# ledger
+RECENT_SALES = 100
+
+
+class TickerLots:
+    __slots__ = ('lots', 'realized', 'sales')
+
+    def __init__(self):
+        # Each lot is [quantity, price, timestamp, transaction id]
+        self.lots = deque()
+        self.realized = 0.0
+        # (sequence, sale) of the most recent sells
+        self.sales = deque(maxlen=RECENT_SALES)
+
+
+class LotBook:
+    """Open tax lots and realized P&L for every ticker under one method.
+
+    FIFO sells from the front of each deque, LIFO from the back, and the
+    average method keeps a single merged lot per ticker.
+    """
+
+    def __init__(self, method):
+        if method not in METHODS:
+            raise ValueError(f'Unknown lot method {method}')
+        self.method = method
+        self.tickers = {}
+        self.sale_count = 0
+        self.version = 0
+        self.last_id = 0
+        self.last_timestamp = None
+
+    def apply(self, txn_id, ticker, side, quantity, price, timestamp):
+        book = self.tickers.get(ticker)
+        if book is None:
+            book = self.tickers[ticker] = TickerLots()
+
+        if side == 'buy':
+            if self.method == 'average' and book.lots:
+                lot = book.lots[0]
+                total = lot[0] + quantity
+                lot[1] = (lot[0] * lot[1] + quantity * price) / total
+                lot[0] = total
+            else:
+                book.lots.append([quantity, price, timestamp, txn_id])
+        elif side == 'sell':
+            lifo = self.method == 'lifo'
+            remaining = quantity
+            cost = 0.0
+            while remaining and book.lots:
+                lot = book.lots[-1] if lifo else book.lots[0]
+                used = min(lot[0], remaining)
+                cost += used * lot[1]
+                lot[0] -= used
+                remaining -= used
+                if lot[0] == 0:
+                    book.lots.pop() if lifo else book.lots.popleft()
+            matched = quantity - remaining
+            realized = matched * price - cost
+            book.realized += realized
+            self.sale_count += 1
+            book.sales.append((self.sale_count, {
+                'id': txn_id,
+                'ticker': ticker,
+                'date': timestamp.strftime('%Y-%m-%d') if timestamp else None,
+                'quantity': quantity,
+                'price': price,
+                'cost': cost,
+                'realized_pl': realized,
+                # Shares sold with no open lot to match, e.g. from imports
+                'unmatched_quantity': remaining,
+            }))
+
+        self.last_id = max(self.last_id, txn_id)
+        if timestamp is not None:
+            self.last_timestamp = timestamp
+
+
+def _columns():
+    return db.select(Transaction.id, Transaction.ticker,
+                     Transaction.transaction_type, Transaction.quantity,
+                     Transaction.price, Transaction.timestamp)
+
+
+class LotTracker:
+    """Keeps a LotBook per (user, method) up to date with the ledger.
+
+    Each trade bumps the user's ledger version by one, so if exactly that
+    many new rows are found, all in time order, they are applied to the
+    book in place. Anything else (imports, rebuilds, out-of-order commits)
+    falls back to a full replay. Books of the least recently used users
+    are dropped past `maxsize` and rebuilt on their next request.
+    """
+
+    def __init__(self, batch_size=10000, maxsize=256):
+        self.batch_size = batch_size
+        self.maxsize = maxsize
+        self._books = OrderedDict()
+        self._user_locks = {}
+        self._lock = threading.Lock()
+
+    def _rebuild(self, user_id, method, version):
+        book = LotBook(method)
+        rows = db.session.execute(
+            _columns()
+            .filter(Transaction.user_id == user_id)
+            .order_by(Transaction.timestamp, Transaction.id)
+            .execution_options(yield_per=self.batch_size)
+        )
+        for row in rows:
+            book.apply(row.id, row.ticker, row.transaction_type,
+                       row.quantity, row.price, row.timestamp)
+        book.version = version
+        return book
+
+    def _catch_up(self, user_id, book, version):
+        rows = db.session.execute(
+            _columns()
+            .filter(Transaction.user_id == user_id,
+                    Transaction.id > book.last_id)
+            .order_by(Transaction.timestamp, Transaction.id)
+        ).all()
+        if len(rows) != version - book.version:
+            return False
+        if rows and book.last_timestamp is not None and (
+                rows[0].timestamp is None or
+                rows[0].timestamp < book.last_timestamp):
+            return False
+        for row in rows:
+            book.apply(row.id, row.ticker, row.transaction_type,
+                       row.quantity, row.price, row.timestamp)
+        book.version = version
+        return True
+
+    def _locked(self, user_id):
+        # One user's replay never blocks another's requests
+        with self._lock:
+            lock = self._user_locks.get(user_id)
+            if lock is None:
+                lock = self._user_locks[user_id] = threading.Lock()
+            return lock
+
+    def _book(self, user_id, method):
+        # Caller holds the user's lock
+        version = get_ledger_version(user_id)
+        key = (user_id, method)
+        with self._lock:
+            book = self._books.get(key)
+        if book is None or (book.version != version and
+                            not self._catch_up(user_id, book, version)):
+            book = self._rebuild(user_id, method, version)
+        with self._lock:
+            self._books[key] = book
+            self._books.move_to_end(key)
+            while len(self._books) > self.maxsize:
+                self._books.popitem(last=False)
+        return book
+
+    def realized(self, user_id, method):
+        """Realized P&L per ticker."""
+        with self._locked(user_id):
+            book = self._book(user_id, method)
+            return {ticker: lots.realized
+                    for ticker, lots in book.tickers.items()}
+
+    def report(self, user_id, method, prices, ticker=None):
+        """Open lots with unrealized P&L at `prices`, plus realized P&L."""
+        with self._locked(user_id):
+            book = self._book(user_id, method)
+            positions = {}
+            for symbol, lots in book.tickers.items():
+                if ticker is not None and symbol != ticker:
+                    continue
+                price = prices.get(symbol)
+                open_lots = [{
+                    'quantity': quantity,
+                    'price': cost,
+                    'date': timestamp.strftime('%Y-%m-%d')
+                    if timestamp else None,
+                    'unrealized_pl': (price - cost) * quantity
+                    if price is not None else None,
+                } for quantity, cost, timestamp, _ in lots.lots]
+                quantity = sum(lot['quantity'] for lot in open_lots)
+                positions[symbol] = {
+                    'quantity': quantity,
+                    'cost_basis': sum(lot['quantity'] * lot['price']
+                                      for lot in open_lots) / quantity
+                    if quantity else 0.0,
+                    'current_price': price,
+                    'realized_pl': lots.realized,
+                    'unrealized_pl': sum(lot['unrealized_pl'] or 0.0
+                                         for lot in open_lots),
+                    'lots': open_lots,
+                }
+            # The most recent sells, oldest first
+            sales = sorted(
+                (sale for symbol, lots in book.tickers.items()
+                 if ticker is None or symbol == ticker
+                 for sale in lots.sales), key=lambda sale: sale[0])
+            return {
+                'method': method,
+                'realized_pl': sum(p['realized_pl']
+                                   for p in positions.values()),
+                'positions': positions,
+                'sales': [sale for _, sale in sales[-RECENT_SALES:]],
+            }
+
+    def open_tickers(self, user_id, method):
+        with self._locked(user_id):
+            book = self._book(user_id, method)
+            return [t for t, lots in book.tickers.items() if lots.lots]
@@ -0,0 +1,294 @@
+# metrics.py
+
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# Seconds; from cache hits up to past the upstream deadline
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+           1.0, 2.5, 5.0, 10.0)
+
+# Where a request's time went. Compute is whatever the others don't cover.
+PHASES = ('db', 'upstream', 'serialize', 'compute')
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        # One slot per bucket plus +Inf, not cumulative until rendered
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class RequestTimer:
+    __slots__ = ('started', 'phases')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = defaultdict(float)
+
+
+class Metrics:
+    """Per-process request, upstream and cache metrics.
+
+    Every gunicorn worker keeps its own; each series carries a `pid` label
+    so series from different workers never get mixed up when scrapes land
+    on different workers.
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.requests = defaultdict(int)
+        self.latency = defaultdict(lambda: Histogram(self.buckets))
+        self.phases = defaultdict(lambda: Histogram(self.buckets))
+        self.upstream = defaultdict(lambda: Histogram(self.buckets))
+        self.upstream_errors = defaultdict(int)
+        self.caches = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    # Request lifecycle, called from the request thread
+
+    def start_request(self):
+        self._local.timer = RequestTimer()
+
+    def finish_request(self, endpoint, method, status):
+        """Record the current request and return its duration."""
+        timer = getattr(self._local, 'timer', None)
+        if timer is None:
+            return 0.0
+        self._local.timer = None
+        total = time.perf_counter() - timer.started
+        timer.phases['compute'] = max(
+            0.0, total - sum(timer.phases.values()))
+        with self._lock:
+            self.requests[(endpoint, method, str(status))] += 1
+            self.latency[(endpoint, method)].observe(total)
+            for phase in PHASES:
+                self.phases[(endpoint, phase)].observe(timer.phases[phase])
+        return total
+
+    def add(self, phase, seconds):
+        timer = getattr(self._local, 'timer', None)
+        if timer is not None:
+            timer.phases[phase] += seconds
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    @contextmanager
+    def upstream_call(self, source):
+        """Time one upstream call and count it as an error if it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            with self._lock:
+                self.upstream_errors[source] += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.upstream[source].observe(elapsed)
+
+    def register_cache(self, name, stats):
+        """`stats` returns a dict with hits, misses and size."""
+        self.caches[name] = stats
+
+    def instrument_engine(self, engine):
+        """Attribute time spent in SQL to the request's db phase."""
+        from sqlalchemy import event
+
+        def before(conn, cursor, statement, parameters, context, many):
+            conn.info.setdefault('query_started', []).append(
+                time.perf_counter())
+
+        def after(conn, cursor, statement, parameters, context, many):
+            started = conn.info['query_started'].pop()
+            self.add('db', time.perf_counter() - started)
+
+        event.listen(engine, 'before_cursor_execute', before)
+        event.listen(engine, 'after_cursor_execute', after)
+
+    # Prometheus text exposition
+
+    def _labels(self, **labels):
+        # Read at render time: the registry is created before gunicorn forks
+        labels['pid'] = os.getpid()
+        return ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+
+    def _histogram(self, lines, name, histogram, **labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), histogram.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{self._labels(le=bound, **labels)}}}'
+                         f' {cumulative}')
+        lines.append(f'{name}_sum{{{self._labels(**labels)}}} {histogram.sum}')
+        lines.append(f'{name}_count{{{self._labels(**labels)}}} '
+                     f'{histogram.count}')
+
+    def render(self):
+        lines = []
+        with self._lock:
+            lines += ['# HELP http_requests_total Requests handled.',
+                      '# TYPE http_requests_total counter']
+            for (endpoint, method, status), count in self.requests.items():
+                labels = self._labels(endpoint=endpoint, method=method,
+                                      status=status)
+                lines.append(f'http_requests_total{{{labels}}} {count}')
+
+            lines += ['# HELP http_request_duration_seconds Request latency.',
+                      '# TYPE http_request_duration_seconds histogram']
+            for (endpoint, method), histogram in self.latency.items():
+                self._histogram(lines, 'http_request_duration_seconds',
+                                histogram, endpoint=endpoint, method=method)
+
+            lines += ['# HELP http_request_phase_seconds Request time by '
+                      'phase (db, upstream, serialize, compute).',
+                      '# TYPE http_request_phase_seconds histogram']
+            for (endpoint, phase), histogram in self.phases.items():
+                self._histogram(lines, 'http_request_phase_seconds',
+                                histogram, endpoint=endpoint, phase=phase)
+
+            lines += ['# HELP upstream_request_duration_seconds Upstream '
+                      'call latency.',
+                      '# TYPE upstream_request_duration_seconds histogram']
+            for source, histogram in self.upstream.items():
+                self._histogram(lines, 'upstream_request_duration_seconds',
+                                histogram, source=source)
+
+            lines += ['# HELP upstream_errors_total Upstream calls that '
+                      'failed.',
+                      '# TYPE upstream_errors_total counter']
+            for source in self.upstream:
+                labels = self._labels(source=source)
+                lines.append(f'upstream_errors_total{{{labels}}} '
+                             f'{self.upstream_errors[source]}')
+
+        caches = {name: stats() for name, stats in self.caches.items()}
+        for metric, kind, key, help_text in (
+                ('cache_hits_total', 'counter', 'hits', 'Cache hits.'),
+                ('cache_misses_total', 'counter', 'misses', 'Cache misses.'),
+                ('cache_entries', 'gauge', 'size', 'Cached entries.'),
+                ('cache_hit_ratio', 'gauge', 'hit_ratio',
+                 'Hits over lookups since start.')):
+            lines += [f'# HELP {metric} {help_text}',
+                      f'# TYPE {metric} {kind}']
+            for name, stats in caches.items():
+                if key in stats:
+                    lines.append(f'{metric}{{{self._labels(cache=name)}}} '
+                                 f'{stats[key]}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"') \
+        .replace('\n', r'\n')
+
+
+class SlowRequestProfiler:
+    """Samples the stacks of in-flight requests and writes a flamegraph
+    for each one slower than `threshold` seconds.
+
+    Output is in folded-stack format (one `frame;frame;... count` line per
+    stack), ready for flamegraph.pl or speedscope. One daemon thread does
+    the sampling, and only while requests are running.
+    """
+
+    def __init__(self, threshold, directory, interval=0.005):
+        self.threshold = threshold
+        self.directory = directory
+        self.interval = interval
+        self._active = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self):
+        ident = threading.get_ident()
+        with self._lock:
+            self._active[ident] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='profiler', daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def stop(self, duration, label):
+        with self._lock:
+            samples = self._active.pop(threading.get_ident(), None)
+        if not samples or duration < self.threshold:
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        name = '{}-{}-{}ms.folded'.format(
+            datetime.utcnow().strftime('%Y%m%dT%H%M%S.%f'),
+            label.strip('/').replace('/', '_').replace('<', '')
+            .replace('>', '') or 'root',
+            int(duration * 1000))
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as f:
+            for stack, count in samples.most_common():
+                f.write(f'{stack} {count}\n')
+        return path
+
+    def _run(self):
+        while True:
+            with self._lock:
+                idents = list(self._active)
+                if not idents:
+                    # Cleared under the lock so a concurrent start() can't
+                    # set it in between and be missed
+                    self._wake.clear()
+            if not idents:
+                self._wake.wait()
+                continue
+            frames = sys._current_frames()
+            for ident in idents:
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{os.path.basename(code.co_filename)}:'
+                                 f'{code.co_name}')
+                    frame = frame.f_back
+                if stack:
+                    with self._lock:
+                        samples = self._active.get(ident)
+                        if samples is not None:
+                            samples[';'.join(reversed(stack))] += 1
+            time.sleep(self.interval)
+
+
+# Shared by every module in the process, like fetcher.executor
+registry = Metrics()
+phase = registry.phase
+upstream_call = registry.upstream_call
+
+
+def create_profiler():
+    threshold = os.environ.get('PROFILE_SLOW_MS')
+    if not threshold:
+        return None
+    return SlowRequestProfiler(
+        threshold=float(threshold) / 1000,
+        directory=os.environ.get(
+            'PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'profiles')),
+        interval=float(os.environ.get('PROFILE_INTERVAL_MS', 5)) / 1000,
+    )
@@ -0,0 +1,44 @@
+"""Add PriceBar and PriceSeries tables
+
+Revision ID: 3a9e6f1d2b80
+Revises: b7d41e2a9c55
+Create Date: 2026-10-18 10:02:47.530218
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3a9e6f1d2b80'
+down_revision = 'b7d41e2a9c55'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('price_bar',
+    sa.Column('ticker', sa.String(length=10), nullable=False),
+    sa.Column('interval', sa.String(length=5), nullable=False),
+    sa.Column('date', sa.DateTime(), nullable=False),
+    sa.Column('open', sa.Float(), nullable=True),
+    sa.Column('high', sa.Float(), nullable=True),
+    sa.Column('low', sa.Float(), nullable=True),
+    sa.Column('close', sa.Float(), nullable=True),
+    sa.Column('adj_close', sa.Float(), nullable=True),
+    sa.Column('volume', sa.BigInteger(), nullable=True),
+    sa.PrimaryKeyConstraint('ticker', 'interval', 'date')
+    )
+    op.create_table('price_series',
+    sa.Column('ticker', sa.String(length=10), nullable=False),
+    sa.Column('interval', sa.String(length=5), nullable=False),
+    sa.Column('first_date', sa.DateTime(), nullable=True),
+    sa.Column('last_date', sa.DateTime(), nullable=True),
+    sa.Column('fetched_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('ticker', 'interval')
+    )
+
+
+def downgrade():
+    op.drop_table('price_series')
+    op.drop_table('price_bar')
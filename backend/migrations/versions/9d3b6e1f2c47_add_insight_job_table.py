@@ -0,0 +1,32 @@
+"""Add InsightJob table
+
+Revision ID: 9d3b6e1f2c47
+Revises: f4a9c2e7b1d8
+Create Date: 2026-10-18 21:04:17.602318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d3b6e1f2c47'
+down_revision = 'f4a9c2e7b1d8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('insight_job',
+    sa.Column('key', sa.String(length=64), nullable=False),
+    sa.Column('status', sa.String(length=10), nullable=False),
+    sa.Column('result', sa.Text(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('key')
+    )
+
+
+def downgrade():
+    op.drop_table('insight_job')
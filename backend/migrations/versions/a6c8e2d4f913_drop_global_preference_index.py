@@ -0,0 +1,29 @@
+"""Drop the unique index on global preference keys
+
+Revision ID: a6c8e2d4f913
+Revises: 9d3b6e1f2c47
+Create Date: 2026-10-18 21:37:52.118406
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6c8e2d4f913'
+down_revision = '9d3b6e1f2c47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Every preference belongs to a user since f4a9c2e7b1d8, so the index
+    # over NULL user_ids covers no rows
+    op.drop_index('uq_preference_global_key', table_name='preference')
+
+
+def downgrade():
+    op.create_index('uq_preference_global_key', 'preference', ['key'],
+                    unique=True,
+                    postgresql_where=sa.text('user_id IS NULL'),
+                    sqlite_where=sa.text('user_id IS NULL'))
@@ -0,0 +1,28 @@
+"""Add PreferenceVersion table
+
+Revision ID: b3f7d9a1c5e8
+Revises: a6c8e2d4f913
+Create Date: 2026-10-19 10:14:36.285913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3f7d9a1c5e8'
+down_revision = 'a6c8e2d4f913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('preference_version',
+    sa.Column('user_id', sa.String(length=36), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+
+def downgrade():
+    op.drop_table('preference_version')
@@ -0,0 +1,76 @@
+"""Add Position table
+
+Revision ID: b7d41e2a9c55
+Revises: 080cbe89c3d1
+Create Date: 2026-10-18 09:12:03.114521
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d41e2a9c55'
+down_revision = '080cbe89c3d1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('position',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('ticker', sa.String(length=10), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('cost_basis', sa.Float(), nullable=False),
+    sa.Column('purchase_date', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('ticker')
+    )
+
+    # Backfill from the existing ledger so current holdings carry over.
+    # Same replay rules as positions.rebuild_positions.
+    # Typed columns, so SQLite hands back datetimes rather than strings
+    conn = op.get_bind()
+    transaction = sa.table('transaction',
+        sa.column('id', sa.Integer),
+        sa.column('ticker', sa.String),
+        sa.column('quantity', sa.Integer),
+        sa.column('transaction_type', sa.String),
+        sa.column('price', sa.Float),
+        sa.column('timestamp', sa.DateTime))
+    rows = conn.execute(
+        sa.select(transaction.c.ticker, transaction.c.quantity,
+                  transaction.c.transaction_type, transaction.c.price,
+                  transaction.c.timestamp)
+        .order_by(transaction.c.timestamp, transaction.c.id)
+    )
+    positions = {}
+    for ticker, quantity, transaction_type, price, timestamp in rows:
+        ticker = ticker.upper()
+        pos = positions.setdefault(ticker, {
+            'ticker': ticker, 'quantity': 0, 'cost_basis': 0.0,
+            'purchase_date': timestamp})
+        if transaction_type == 'buy':
+            total_cost = pos['cost_basis'] * pos['quantity'] + price * quantity
+            pos['quantity'] += quantity
+            pos['cost_basis'] = total_cost / \
+                pos['quantity'] if pos['quantity'] > 0 else 0.0
+            if timestamp is not None and (pos['purchase_date'] is None or
+                                          timestamp < pos['purchase_date']):
+                pos['purchase_date'] = timestamp
+        elif transaction_type == 'sell':
+            pos['quantity'] -= quantity
+            if pos['quantity'] <= 0:
+                pos['cost_basis'] = 0.0
+
+    if positions:
+        position_table = sa.table('position',
+            sa.column('ticker', sa.String),
+            sa.column('quantity', sa.Integer),
+            sa.column('cost_basis', sa.Float),
+            sa.column('purchase_date', sa.DateTime))
+        op.bulk_insert(position_table, list(positions.values()))
+
+
+def downgrade():
+    op.drop_table('position')
@@ -0,0 +1,34 @@
+"""Generate Transaction ids from a sequence
+
+Revision ID: c5f08d7e4a13
+Revises: 3a9e6f1d2b80
+Create Date: 2026-10-18 11:40:15.206734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5f08d7e4a13'
+down_revision = '3a9e6f1d2b80'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # SQLite assigns INTEGER PRIMARY KEY ids itself, nothing to do there
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE SEQUENCE IF NOT EXISTS transaction_id_seq '
+               'OWNED BY "transaction".id')
+    op.execute('ALTER TABLE "transaction" ALTER COLUMN id '
+               "SET DEFAULT nextval('transaction_id_seq')")
+    # Start above the old random ids (100000-999999) so they never collide
+    op.execute("SELECT setval('transaction_id_seq', GREATEST("
+               '(SELECT COALESCE(MAX(id), 0) FROM "transaction"), 999999))')
+
+
+def downgrade():
+    # Leave the sequence in place, existing ids depend on it staying unique
+    pass
@@ -0,0 +1,41 @@
+"""Add Transaction and Preference indexes
+
+Revision ID: d2e7a4b19f60
+Revises: c5f08d7e4a13
+Create Date: 2026-10-18 12:31:52.887104
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2e7a4b19f60'
+down_revision = 'c5f08d7e4a13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_transaction_timestamp', 'transaction',
+                    ['timestamp'], unique=False)
+    op.create_index('ix_transaction_ticker_timestamp', 'transaction',
+                    ['ticker', 'timestamp', 'transaction_type', 'quantity'],
+                    unique=False)
+
+    # unique_user_key never applied to NULL user_ids, so duplicate global
+    # keys may exist. Keep the newest row of each before adding the index.
+    op.execute(
+        'DELETE FROM preference WHERE user_id IS NULL AND id NOT IN ('
+        'SELECT MAX(id) FROM preference WHERE user_id IS NULL GROUP BY key)'
+    )
+    op.create_index('uq_preference_global_key', 'preference', ['key'],
+                    unique=True,
+                    postgresql_where=sa.text('user_id IS NULL'),
+                    sqlite_where=sa.text('user_id IS NULL'))
+
+
+def downgrade():
+    op.drop_index('uq_preference_global_key', table_name='preference')
+    op.drop_index('ix_transaction_ticker_timestamp', table_name='transaction')
+    op.drop_index('ix_transaction_timestamp', table_name='transaction')
@@ -0,0 +1,29 @@
+"""Add LedgerVersion table
+
+Revision ID: e81b3c6d5f27
+Revises: d2e7a4b19f60
+Create Date: 2026-10-18 14:05:26.918340
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e81b3c6d5f27'
+down_revision = 'd2e7a4b19f60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    ledger_version = op.create_table('ledger_version',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.bulk_insert(ledger_version, [{'id': 1, 'version': 0}])
+
+
+def downgrade():
+    op.drop_table('ledger_version')
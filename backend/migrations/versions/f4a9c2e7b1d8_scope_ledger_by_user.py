@@ -0,0 +1,172 @@
+"""Scope ledger, positions and preferences by user
+
+Revision ID: f4a9c2e7b1d8
+Revises: e81b3c6d5f27
+Create Date: 2026-10-18 16:22:41.530917
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4a9c2e7b1d8'
+down_revision = 'e81b3c6d5f27'
+branch_labels = None
+depends_on = None
+
+# Existing rows all belonged to the single global portfolio
+DEFAULT_USER = 'default'
+
+# Hash partitions of "transaction" on Postgres. Changing the count later
+# means repartitioning; 16 keeps per-partition indexes small well into the
+# thousands of users
+TRANSACTION_PARTITIONS = 16
+
+TRANSACTION_COLUMNS = 'id, ticker, quantity, transaction_type, price, timestamp'
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        _partition_transactions()
+    else:
+        with op.batch_alter_table('transaction') as batch_op:
+            batch_op.add_column(sa.Column(
+                'user_id', sa.String(length=36), nullable=False,
+                server_default=DEFAULT_USER))
+            batch_op.drop_index('ix_transaction_ticker_timestamp')
+            batch_op.drop_index('ix_transaction_timestamp')
+        _create_transaction_indexes()
+
+    # Positions: one row per (user, ticker) instead of per ticker. SQLite
+    # reports the original constraint unnamed, the convention names it.
+    ticker_key = next(
+        c['name'] or 'uq_position_ticker'
+        for c in sa.inspect(op.get_bind()).get_unique_constraints('position')
+        if c['column_names'] == ['ticker'])
+    with op.batch_alter_table('position', naming_convention={
+            'uq': 'uq_%(table_name)s_%(column_0_name)s'}) as batch_op:
+        batch_op.add_column(sa.Column(
+            'user_id', sa.String(length=36), nullable=False,
+            server_default=DEFAULT_USER))
+        batch_op.drop_constraint(ticker_key, type_='unique')
+        batch_op.create_unique_constraint(
+            'uq_position_user_ticker', ['user_id', 'ticker'])
+
+    # Global preferences (the balance among them) move to the default user
+    op.execute(
+        f"UPDATE preference SET user_id = '{DEFAULT_USER}' "
+        'WHERE user_id IS NULL')
+
+    # One ledger version per user, carrying over the global one
+    version = op.get_bind().execute(sa.text(
+        'SELECT MAX(version) FROM ledger_version')).scalar() or 0
+    op.drop_table('ledger_version')
+    ledger_version = op.create_table('ledger_version',
+    sa.Column('user_id', sa.String(length=36), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.bulk_insert(ledger_version,
+                   [{'user_id': DEFAULT_USER, 'version': version}])
+
+
+def _create_transaction_indexes():
+    # On a partitioned table these cascade to every partition
+    op.create_index('ix_transaction_user_timestamp', 'transaction',
+                    ['user_id', 'timestamp'], unique=False)
+    op.create_index('ix_transaction_user_ticker_timestamp', 'transaction',
+                    ['user_id', 'ticker', 'timestamp', 'transaction_type',
+                     'quantity'], unique=False)
+
+
+def _partition_transactions():
+    # A table can't be partitioned in place: build the partitioned table
+    # beside the old one, copy the rows over and swap. The primary key has
+    # to include the partition key; ids keep coming from the same sequence.
+    op.execute('ALTER TABLE "transaction" RENAME TO transaction_unpartitioned')
+    op.execute('ALTER TABLE transaction_unpartitioned '
+               'RENAME CONSTRAINT transaction_pkey '
+               'TO transaction_unpartitioned_pkey')
+    op.execute(f'''
+        CREATE TABLE "transaction" (
+            id INTEGER NOT NULL DEFAULT nextval('transaction_id_seq'),
+            user_id VARCHAR(36) NOT NULL DEFAULT '{DEFAULT_USER}',
+            ticker VARCHAR(10) NOT NULL,
+            quantity INTEGER NOT NULL,
+            transaction_type VARCHAR(10) NOT NULL,
+            price FLOAT NOT NULL,
+            timestamp TIMESTAMP WITHOUT TIME ZONE,
+            CONSTRAINT transaction_pkey PRIMARY KEY (user_id, id)
+        ) PARTITION BY HASH (user_id)
+    ''')
+    for remainder in range(TRANSACTION_PARTITIONS):
+        op.execute(
+            f'CREATE TABLE transaction_p{remainder} PARTITION OF "transaction" '
+            f'FOR VALUES WITH (MODULUS {TRANSACTION_PARTITIONS}, '
+            f'REMAINDER {remainder})')
+    op.execute(
+        f'INSERT INTO "transaction" (user_id, {TRANSACTION_COLUMNS}) '
+        f"SELECT '{DEFAULT_USER}', {TRANSACTION_COLUMNS} "
+        'FROM transaction_unpartitioned')
+    # The sequence is owned by the old column and would go with it
+    op.execute('ALTER SEQUENCE transaction_id_seq OWNED BY "transaction".id')
+    op.drop_table('transaction_unpartitioned')
+    _create_transaction_indexes()
+
+
+def downgrade():
+    # Folds every user's ledger back into the single global portfolio
+    version = op.get_bind().execute(sa.text(
+        'SELECT MAX(version) FROM ledger_version')).scalar() or 0
+    op.drop_table('ledger_version')
+    ledger_version = op.create_table('ledger_version',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.bulk_insert(ledger_version, [{'id': 1, 'version': version}])
+
+    op.execute(
+        f"UPDATE preference SET user_id = NULL WHERE user_id = '{DEFAULT_USER}'")
+
+    # Positions of other users can't be merged meaningfully; drop them and
+    # run `flask rebuild-positions` after downgrading
+    op.execute(f"DELETE FROM position WHERE user_id <> '{DEFAULT_USER}'")
+    with op.batch_alter_table('position') as batch_op:
+        batch_op.drop_constraint('uq_position_user_ticker', type_='unique')
+        batch_op.create_unique_constraint('position_ticker_key', ['ticker'])
+        batch_op.drop_column('user_id')
+
+    op.drop_index('ix_transaction_user_ticker_timestamp',
+                  table_name='transaction')
+    op.drop_index('ix_transaction_user_timestamp', table_name='transaction')
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('ALTER TABLE "transaction" RENAME TO transaction_partitioned')
+        op.execute('ALTER TABLE transaction_partitioned '
+                   'RENAME CONSTRAINT transaction_pkey '
+                   'TO transaction_partitioned_pkey')
+        op.create_table('transaction',
+        sa.Column('id', sa.Integer(), nullable=False,
+                  server_default=sa.text("nextval('transaction_id_seq')")),
+        sa.Column('ticker', sa.String(length=10), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('transaction_type', sa.String(length=10), nullable=False),
+        sa.Column('price', sa.Float(), nullable=False),
+        sa.Column('timestamp', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id', name='transaction_pkey')
+        )
+        op.execute(
+            f'INSERT INTO "transaction" ({TRANSACTION_COLUMNS}) '
+            f'SELECT {TRANSACTION_COLUMNS} FROM transaction_partitioned')
+        op.execute(
+            'ALTER SEQUENCE transaction_id_seq OWNED BY "transaction".id')
+        op.drop_table('transaction_partitioned')
+    else:
+        with op.batch_alter_table('transaction') as batch_op:
+            batch_op.drop_column('user_id')
+    op.create_index('ix_transaction_timestamp', 'transaction',
+                    ['timestamp'], unique=False)
+    op.create_index('ix_transaction_ticker_timestamp', 'transaction',
+                    ['ticker', 'timestamp', 'transaction_type', 'quantity'],
+                    unique=False)
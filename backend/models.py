@@ -5,9 +5,17 @@ from datetime import datetime, timedelta
 
 db = SQLAlchemy()
 
+# Owner of everything created before per-user scoping, and of requests that
+# don't name a user
+DEFAULT_USER = 'default'
+
 
 class Transaction(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
+    # On Postgres the table is hash partitioned by user_id and its primary
+    # key is (user_id, id); ids still come from one global sequence
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    user_id = db.Column(db.String(36), nullable=False, default=DEFAULT_USER,
+                        server_default=DEFAULT_USER)
     ticker = db.Column(db.String(10), nullable=False)
     quantity = db.Column(db.Integer, nullable=False)
     transaction_type = db.Column(
@@ -15,6 +23,15 @@ class Transaction(db.Model):
     price = db.Column(db.Float, nullable=False)  # Add this field
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)  # Change this
 
+    __table_args__ = (
+        # Ledger replays and history walk one user's ledger in time order
+        db.Index('ix_transaction_user_timestamp', 'user_id', 'timestamp'),
+        # Per-ticker lookups in time order; also covers the daily
+        # holdings aggregate so it never touches the table
+        db.Index('ix_transaction_user_ticker_timestamp', 'user_id', 'ticker',
+                 'timestamp', 'transaction_type', 'quantity'),
+    )
+
 
 class Preference(db.Model):
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
@@ -25,3 +42,66 @@ class Preference(db.Model):
     __table_args__ = (
         db.UniqueConstraint('user_id', 'key', name='unique_user_key'),
     )
+
+
+class Position(db.Model):
+    # Materialized holdings, kept in sync with Transaction by positions.py
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    user_id = db.Column(db.String(36), nullable=False, default=DEFAULT_USER,
+                        server_default=DEFAULT_USER)
+    ticker = db.Column(db.String(10), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    cost_basis = db.Column(db.Float, nullable=False, default=0.0)
+    purchase_date = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'ticker',
+                            name='uq_position_user_ticker'),
+    )
+
+
+class PriceBar(db.Model):
+    # Locally stored OHLCV bars, filled incrementally by history.py
+    ticker = db.Column(db.String(10), primary_key=True)
+    interval = db.Column(db.String(5), primary_key=True)
+    date = db.Column(db.DateTime, primary_key=True)
+    open = db.Column(db.Float, nullable=True)
+    high = db.Column(db.Float, nullable=True)
+    low = db.Column(db.Float, nullable=True)
+    close = db.Column(db.Float, nullable=True)
+    adj_close = db.Column(db.Float, nullable=True)
+    volume = db.Column(db.BigInteger, nullable=True)
+
+
+class PriceSeries(db.Model):
+    # Date range covered by the stored bars of one (ticker, interval)
+    ticker = db.Column(db.String(10), primary_key=True)
+    interval = db.Column(db.String(5), primary_key=True)
+    first_date = db.Column(db.DateTime, nullable=True)
+    last_date = db.Column(db.DateTime, nullable=True)
+    fetched_at = db.Column(db.DateTime, nullable=True)
+
+
+class LedgerVersion(db.Model):
+    # One row per user, bumped in the same transaction as every change to
+    # that user's ledger; derived caches are keyed by it (see snapshots.py)
+    user_id = db.Column(db.String(36), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+class PreferenceVersion(db.Model):
+    # One row per user, bumped with every preference write so each worker's
+    # preference cache notices writes made by the others (preferences.py)
+    user_id = db.Column(db.String(36), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+class InsightJob(db.Model):
+    # AI summaries by request hash: the running job and, once done, the
+    # cached answer, shared by every worker (see insights.py)
+    key = db.Column(db.String(64), primary_key=True)
+    status = db.Column(db.String(10), nullable=False)  # pending/done/error
+    result = db.Column(db.Text, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False)
+    finished_at = db.Column(db.DateTime, nullable=True)
@@ -0,0 +1,54 @@
+# portfolio_engine.py
+
+import numpy as np
+import pandas as pd
+
+
+def trade_matrix(deltas):
+    """Cumulative quantity held per ticker after each trade date.
+
+    `deltas` has one row per (date, ticker) with the signed net quantity
+    traded that day.
+    """
+    if deltas.empty:
+        return pd.DataFrame(dtype=float)
+    matrix = deltas.pivot_table(index='date', columns='ticker',
+                                values='quantity', aggfunc='sum',
+                                fill_value=0)
+    return matrix.sort_index().cumsum()
+
+
+def held_tickers(deltas, start):
+    """Tickers with a non-zero position at any point since `start`."""
+    cum = trade_matrix(deltas)
+    if cum.empty:
+        return []
+    held = cum[cum.index >= start].ne(0).any()
+    before = cum[cum.index < start]
+    if len(before):
+        held |= before.iloc[-1].ne(0)
+    return sorted(held[held].index)
+
+
+def holdings_over_time(deltas, dates, tickers):
+    """Quantity held per ticker on each of `dates` (date x ticker)."""
+    cum = trade_matrix(deltas)
+    if cum.empty:
+        return pd.DataFrame(0.0, index=dates, columns=tickers)
+    cum = cum.reindex(columns=tickers, fill_value=0)
+    # Carry the last known quantity forward onto every price date
+    return cum.reindex(cum.index.union(dates)).ffill().fillna(0.0).loc[dates]
+
+
+def portfolio_values(closes, holdings):
+    """Total portfolio value per date from a close matrix and holdings.
+
+    Missing closes reuse the previous close for that ticker.
+    """
+    if closes.empty:
+        return pd.Series(dtype=float, index=pd.DatetimeIndex([]))
+    prices = closes.ffill().fillna(0.0).to_numpy(dtype=float)
+    quantities = holdings.reindex(index=closes.index, columns=closes.columns,
+                                  fill_value=0).to_numpy(dtype=float)
+    return pd.Series(np.einsum('ij,ij->i', prices, quantities),
+                     index=closes.index)
@@ -0,0 +1,199 @@
+# positions.py
+
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Position, Transaction, LedgerVersion
+
+
+class Oversold(ValueError):
+    """A sell of more shares than were held at the time."""
+
+    def __init__(self, ticker, timestamp, quantity, held):
+        super().__init__(
+            f'Sell of {quantity} {ticker} on {timestamp:%Y-%m-%d %H:%M:%S} '
+            f'exceeds the {held} shares held')
+        self.ticker = ticker
+        self.timestamp = timestamp
+
+
+def apply_transaction(position, transaction_type, quantity, price, timestamp):
+    # Same running average cost rules the ledger replay used to apply
+    if position.quantity is None:
+        position.quantity = 0
+    if position.cost_basis is None:
+        position.cost_basis = 0.0
+    if position.purchase_date is None:
+        position.purchase_date = timestamp
+
+    if transaction_type == 'buy':
+        total_cost = position.cost_basis * position.quantity
+        total_cost += price * quantity
+        position.quantity += quantity
+        position.cost_basis = total_cost / \
+            position.quantity if position.quantity > 0 else 0.0
+        # Keep the earliest buy as the purchase date
+        if timestamp < position.purchase_date:
+            position.purchase_date = timestamp
+    elif transaction_type == 'sell':
+        position.quantity -= quantity
+        if position.quantity <= 0:
+            position.cost_basis = 0.0
+    return position
+
+
+def bump_ledger_version(user_id):
+    """Mark the user's ledger as changed. Caller commits with the change."""
+    result = db.session.execute(
+        db.update(LedgerVersion)
+        .where(LedgerVersion.user_id == user_id)
+        .values(version=LedgerVersion.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount:
+        return
+
+    try:
+        # First change for this user; another may insert it concurrently
+        with db.session.begin_nested():
+            db.session.add(LedgerVersion(user_id=user_id, version=1))
+    except IntegrityError:
+        bump_ledger_version(user_id)
+
+
+def get_ledger_version(user_id):
+    return db.session.execute(
+        db.select(LedgerVersion.version).filter_by(user_id=user_id)
+    ).scalar() or 0
+
+
+def add_to_position(user_id, ticker, quantity, price, timestamp):
+    """Atomically add a buy to the ticker's position. Caller commits."""
+    # SET expressions all see the pre-update row, so this is one
+    # read-modify-write in the database rather than in Python
+    result = db.session.execute(
+        db.update(Position)
+        .where(Position.user_id == user_id, Position.ticker == ticker)
+        .values(
+            # Same zero guard as apply_transaction, for ledgers that were
+            # oversold before sells were checked
+            cost_basis=db.case(
+                (Position.quantity + quantity > 0,
+                 (Position.cost_basis * Position.quantity + price * quantity)
+                 / (Position.quantity + quantity)),
+                else_=0.0),
+            quantity=Position.quantity + quantity)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount:
+        return
+
+    try:
+        # First buy of this ticker; another trade may insert it concurrently
+        with db.session.begin_nested():
+            db.session.add(Position(user_id=user_id, ticker=ticker,
+                                    quantity=quantity, cost_basis=price,
+                                    purchase_date=timestamp))
+    except IntegrityError:
+        add_to_position(user_id, ticker, quantity, price, timestamp)
+
+
+def remove_from_position(user_id, ticker, quantity):
+    """Atomically take a sell out of the ticker's position.
+
+    Returns False, changing nothing, if fewer than `quantity` shares are
+    held. Caller commits.
+    """
+    remaining = Position.quantity - quantity
+    result = db.session.execute(
+        db.update(Position)
+        .where(Position.user_id == user_id, Position.ticker == ticker,
+               Position.quantity >= quantity)
+        .values(
+            quantity=remaining,
+            cost_basis=db.case((remaining <= 0, 0.0),
+                               else_=Position.cost_basis))
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount > 0
+
+
+def rebuild_positions(user_id, batch_size=10000, commit=True,
+                      check_oversells=False):
+    """Reconstruct a user's positions from their Transaction ledger.
+
+    With `check_oversells`, raises Oversold at the first sell of more
+    shares than were held at that point, changing nothing.
+    """
+    positions = {}
+    transactions = db.session.execute(
+        db.select(Transaction)
+        .filter(Transaction.user_id == user_id)
+        .order_by(Transaction.timestamp, Transaction.id)
+        .execution_options(yield_per=batch_size)
+    ).scalars()
+
+    for txn in transactions:
+        ticker = txn.ticker.upper()
+        position = positions.get(ticker)
+        if position is None:
+            position = positions[ticker] = Position(
+                user_id=user_id, ticker=ticker, quantity=0, cost_basis=0.0)
+        timestamp = txn.timestamp or datetime.utcnow()
+        if check_oversells and txn.transaction_type == 'sell' and \
+                txn.quantity > position.quantity:
+            raise Oversold(ticker, timestamp, txn.quantity, position.quantity)
+        apply_transaction(position, txn.transaction_type, txn.quantity,
+                          txn.price, timestamp)
+
+    db.session.execute(db.delete(Position).filter(Position.user_id == user_id))
+    db.session.add_all(positions.values())
+    bump_ledger_version(user_id)
+    if commit:
+        db.session.commit()
+    return len(positions)
+
+
+def ledger_users():
+    """Every user with a ledger or positions."""
+    return sorted(set(db.session.execute(
+        db.select(Transaction.user_id).distinct()).scalars()) | set(
+        db.session.execute(db.select(Position.user_id).distinct()).scalars()))
+
+
+def get_holdings(user_id):
+    """Return {ticker: quantity} for the user's open positions."""
+    rows = db.session.execute(
+        db.select(Position.ticker, Position.quantity)
+        .filter(Position.user_id == user_id, Position.quantity != 0)
+    ).all()
+    return {ticker: quantity for ticker, quantity in rows}
+
+
+def get_open_positions(user_id):
+    return db.session.execute(
+        db.select(Position)
+        .filter(Position.user_id == user_id, Position.quantity > 0)
+    ).scalars().all()
+
+
+def get_daily_trade_deltas(user_id):
+    """Signed net quantity traded per (date, ticker), aggregated in SQL."""
+    signed = db.case(
+        (Transaction.transaction_type == 'buy', Transaction.quantity),
+        (Transaction.transaction_type == 'sell', -Transaction.quantity),
+        else_=0)
+    day = db.func.date(Transaction.timestamp)
+    # Tickers are stored upper-case, so group on the bare column and let
+    # the (user_id, ticker, timestamp) index feed the aggregate in order
+    rows = db.session.execute(
+        db.select(day, Transaction.ticker, db.func.sum(signed))
+        .filter(Transaction.user_id == user_id,
+                Transaction.timestamp.isnot(None))
+        .group_by(Transaction.ticker, day)
+    ).all()
+    frame = pd.DataFrame(rows, columns=['date', 'ticker', 'quantity'])
+    frame['date'] = pd.to_datetime(frame['date'])
+    return frame
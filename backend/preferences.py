@@ -0,0 +1,117 @@
+# preferences.py
+
+import os
+
+from sqlalchemy.dialects import postgresql, sqlite
+
+from cache import TTLCache
+from models import db, Preference, PreferenceVersion
+
+# Marks keys known to be unset, so repeated misses stay off the database
+_MISSING = object()
+
+INSERTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+
+class PreferenceStore:
+    """Read-through / write-through cache over each user's Preference rows.
+
+    Entries are keyed by the user's PreferenceVersion, which every write
+    bumps in the same transaction, so a write made by any worker is seen by
+    the next read everywhere; a read costs one primary key lookup when all
+    keys are cached. Keys in `uncached` always go to the database; they
+    are changed by other code paths (e.g. the balance, which trades update
+    in SQL) and aren't covered by the version.
+    """
+
+    def __init__(self, maxsize=1024, ttl=30, uncached=()):
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.uncached = frozenset(uncached)
+
+    def version(self, user_id):
+        return db.session.execute(
+            db.select(PreferenceVersion.version).filter_by(user_id=user_id)
+        ).scalar() or 0
+
+    def get_many(self, user_id, keys):
+        """Return {key: value} for the keys that are set, in one query."""
+        # Read before the values, so a concurrent write can only leave
+        # newer values under an older version, never the reverse
+        version = self.version(user_id)
+        values, misses = {}, []
+        for key in dict.fromkeys(keys):
+            value = None if key in self.uncached \
+                else self.cache.get((user_id, key, version))
+            if value is None:
+                misses.append(key)
+            elif value is not _MISSING:
+                values[key] = value
+
+        if misses:
+            rows = dict(db.session.execute(
+                db.select(Preference.key, Preference.value)
+                .filter(Preference.user_id == user_id,
+                        Preference.key.in_(misses))
+            ).all())
+            for key in misses:
+                if key in rows:
+                    values[key] = rows[key]
+                if key not in self.uncached:
+                    self.cache.put((user_id, key, version),
+                                   rows.get(key, _MISSING))
+        return values
+
+    def get(self, user_id, key):
+        return self.get_many(user_id, [key]).get(key)
+
+    def set_many(self, user_id, values):
+        """Upsert several preferences in a single statement and commit."""
+        if not values:
+            return
+        # The column is text; cache exactly what it will read back as
+        values = {key: None if value is None else str(value)
+                  for key, value in values.items()}
+        insert = INSERTS[db.engine.dialect.name]
+        stmt = insert(Preference).values([
+            {'user_id': user_id, 'key': key, 'value': value}
+            for key, value in values.items()
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Preference.user_id, Preference.key],
+            set_={'value': stmt.excluded.value})
+        bump = insert(PreferenceVersion).values(user_id=user_id, version=1)
+        bump = bump.on_conflict_do_update(
+            index_elements=[PreferenceVersion.user_id],
+            set_={'version': PreferenceVersion.version + 1},
+        ).returning(PreferenceVersion.version)
+        try:
+            db.session.execute(stmt)
+            version = db.session.execute(bump).scalar_one()
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        for key, value in values.items():
+            if key not in self.uncached:
+                self.cache.put((user_id, key, version), value)
+
+    def set(self, user_id, key, value):
+        self.set_many(user_id, {key: value})
+
+    def invalidate(self):
+        self.cache.invalidate()
+
+    def stats(self):
+        return self.cache.stats()
+
+
+def create_preference_store(uncached=()):
+    return PreferenceStore(
+        maxsize=int(os.environ.get('PREFERENCE_CACHE_SIZE', 1024)),
+        ttl=float(os.environ.get('PREFERENCE_CACHE_TTL', 30)),
+        uncached=uncached,
+    )
@@ -0,0 +1,254 @@
+# prewarm.py
+
+from collections import OrderedDict
+from datetime import datetime, timezone
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # Not on Windows; every worker then syncs bars itself
+    fcntl = None
+
+from history import period_start
+from models import db, Position
+from quotes import is_market_open, MARKET_TZ, MARKET_CLOSE
+
+logger = logging.getLogger(__name__)
+
+# Quotes are refetched once this much of their TTL has passed, so requests
+# find them fresh instead of expiring just as someone asks
+REFRESH_AHEAD = 0.8
+
+# Daily bars are synced in chunks of this many tickers (one download each)
+HISTORY_BATCH = 50
+
+# Minutes after the close before the day's bar is taken as final
+SETTLE_MINUTES = 15
+
+# Held by the one worker on this host that syncs bars for everyone
+DEFAULT_LOCK = os.path.join(tempfile.gettempdir(), 'finviewer-prewarm.lock')
+
+
+class Prewarmer:
+    """Keeps quotes and daily bars of held and recently viewed tickers warm
+    so user requests rarely wait on the upstream.
+
+    One daemon thread per process, since each gunicorn worker has its own
+    quote cache. Quotes are refreshed ahead of their TTL, which follows
+    market hours. Bars live in the database and are shared, so only the
+    worker holding the file lock at `lock_path` syncs them: whenever the
+    history store would consider them outdated while the market is open,
+    and once more after the close for the final bar. If it exits, another
+    worker takes the lock on its next cycle.
+
+    `rate` is the upstream calls per second for the whole server; each of
+    the `workers` paces itself to its share, and every wait is jittered so
+    workers don't go upstream in lockstep.
+    """
+
+    def __init__(self, app, quote_cache, history_store, rate=5.0,
+                 jitter=0.2, recent_ttl=3600, max_tickers=500,
+                 history_period='1y', market_open=is_market_open,
+                 lock_path=DEFAULT_LOCK):
+        self.app = app
+        self.quote_cache = quote_cache
+        self.history_store = history_store
+        self.rate = rate
+        self.jitter = jitter
+        self.recent_ttl = recent_ttl
+        self.max_tickers = max_tickers
+        self.history_period = history_period
+        self.market_open = market_open
+        self.lock_path = lock_path
+        self.workers = 1
+        self._lock_file = None
+        self._recent = OrderedDict()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._history_synced_at = None
+        self._history_closed_day = None
+        self.cycles = 0
+        self.quotes_refreshed = 0
+        self.history_syncs = 0
+        self.errors = 0
+
+    def start(self, workers=1):
+        # Threads don't survive a fork, so each worker starts its own
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self.workers = max(1, workers)
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name='prewarm', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def touch(self, tickers):
+        """Note tickers a user just looked at."""
+        now = time.monotonic()
+        with self._lock:
+            for ticker in tickers:
+                key = ticker.upper()
+                self._recent[key] = now
+                self._recent.move_to_end(key)
+            while len(self._recent) > self.max_tickers:
+                self._recent.popitem(last=False)
+
+    def recent(self):
+        cutoff = time.monotonic() - self.recent_ttl
+        with self._lock:
+            while self._recent and next(iter(self._recent.values())) < cutoff:
+                self._recent.popitem(last=False)
+            # Most recently viewed first
+            return list(reversed(self._recent))
+
+    def held(self):
+        return db.session.execute(
+            db.select(Position.ticker)
+            .filter(Position.quantity != 0)
+            .distinct()
+        ).scalars().all()
+
+    def tickers(self):
+        """Held tickers, then recently viewed ones, up to max_tickers."""
+        tickers = dict.fromkeys(t.upper() for t in self.held())
+        tickers.update(dict.fromkeys(self.recent()))
+        return list(tickers)[:self.max_tickers]
+
+    def worker_rate(self):
+        return self.rate / self.workers
+
+    def history_leader(self):
+        """True if this worker holds (or just took) the bar sync lock."""
+        if fcntl is None or self.lock_path is None:
+            return True
+        if self._lock_file is not None:
+            return True
+        lock_file = open(self.lock_path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        # Held until the process exits
+        self._lock_file = lock_file
+        return True
+
+    def _wait(self, seconds):
+        """Sleep a jittered `seconds`; True if stopped meanwhile."""
+        spread = seconds * self.jitter
+        return self._stop.wait(max(0.0, seconds + random.uniform(-spread,
+                                                                   spread)))
+
+    def warm_quotes(self, tickers):
+        # Only what would expire soon goes upstream
+        now, ttl = self.quote_cache.clock(), self.quote_cache.ttl()
+        due = [t for t in tickers
+               if (self.quote_cache.peek(t)[1] or float('-inf'))
+               <= now - ttl * REFRESH_AHEAD]
+        rate = self.worker_rate()
+        batch = max(1, int(rate))
+        for i in range(0, len(due), batch):
+            started = time.monotonic()
+            _, errors, _ = self.quote_cache.get_many(
+                due[i:i + batch], max_age=ttl * REFRESH_AHEAD)
+            self.quotes_refreshed += len(due[i:i + batch]) - len(errors)
+            if errors:
+                logger.warning(f'Prewarm quote errors: {errors}')
+            if i + batch < len(due) and self._stop.wait(
+                    max(0.0, batch / rate - (time.monotonic() - started))):
+                return
+
+    def history_due(self, now=None):
+        now = now or datetime.now(timezone.utc)
+        if self._history_synced_at is None:
+            # Right after start-up, whatever the time
+            return True
+        if self.market_open(now):
+            return now - self._history_synced_at >= \
+                self.history_store.refresh_interval
+        market_now = now.astimezone(MARKET_TZ)
+        settled = market_now.weekday() < 5 and \
+            market_now.hour * 60 + market_now.minute >= \
+            MARKET_CLOSE.hour * 60 + MARKET_CLOSE.minute + SETTLE_MINUTES
+        return settled and self._history_closed_day != market_now.date()
+
+    def warm_history(self, tickers, now=None):
+        now = now or datetime.now(timezone.utc)
+        start = period_start(self.history_period)
+        for i in range(0, len(tickers), HISTORY_BATCH):
+            stale = self.history_store.sync(tickers[i:i + HISTORY_BATCH],
+                                            start, '1d')
+            self.history_syncs += 1
+            if stale:
+                logger.warning(f'Prewarm could not refresh bars: {stale}')
+            if i + HISTORY_BATCH < len(tickers) and \
+                    self._wait(HISTORY_BATCH / self.worker_rate()):
+                return
+        self._history_synced_at = now
+        if not self.market_open(now):
+            self._history_closed_day = now.astimezone(MARKET_TZ).date()
+
+    def run_once(self):
+        with self.app.app_context():
+            tickers = self.tickers()
+            if not tickers:
+                return
+            self.warm_quotes(tickers)
+            if self.history_due() and self.history_leader():
+                self.warm_history(tickers)
+            self.cycles += 1
+
+    def _run(self):
+        # Spread worker start-up so they don't all go upstream at once
+        if self._wait(random.uniform(0, 5)):
+            return
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f'Prewarm cycle failed: {e!r}')
+            # Wake up well within the shortest quote TTL
+            if self._wait(self.quote_cache.ttl() * (1 - REFRESH_AHEAD)):
+                return
+
+    def stats(self):
+        return {
+            'running': self._thread is not None and self._thread.is_alive()
+            and self._pid == os.getpid(),
+            'recent': len(self._recent),
+            'workers': self.workers,
+            'history_leader': self._lock_file is not None or fcntl is None,
+            'cycles': self.cycles,
+            'quotes_refreshed': self.quotes_refreshed,
+            'history_syncs': self.history_syncs,
+            'errors': self.errors,
+        }
+
+
+def create_prewarmer(app, quote_cache, history_store):
+    if os.environ.get('PREWARM', '1') != '1':
+        return None
+    return Prewarmer(
+        app, quote_cache, history_store,
+        rate=float(os.environ.get('PREWARM_RATE', 5)),
+        recent_ttl=float(os.environ.get('PREWARM_RECENT_TTL', 3600)),
+        max_tickers=int(os.environ.get('PREWARM_MAX_TICKERS', 500)),
+        history_period=os.environ.get('PREWARM_HISTORY_PERIOD', '1y'),
+        lock_path=os.environ.get('PREWARM_LOCK', DEFAULT_LOCK),
+    )
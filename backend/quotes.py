@@ -0,0 +1,318 @@
+# quotes.py
+
+from collections import OrderedDict
+from datetime import datetime, time as dtime, timezone, timedelta
+import json
+import os
+import threading
+import time
+
+import fetcher
+from fetcher import UpstreamTimeout
+import metrics
+
+try:
+    from zoneinfo import ZoneInfo
+    MARKET_TZ = ZoneInfo('America/New_York')
+except Exception:
+    # No tz database available, fall back to a fixed EST offset
+    MARKET_TZ = timezone(timedelta(hours=-5))
+
+MARKET_OPEN = dtime(9, 30)
+MARKET_CLOSE = dtime(16, 0)
+
+# get_many()'s error for quotes not fetched within the timeout
+TIMEOUT_ERROR = 'Timed out fetching quote'
+
+
+def is_market_open(now=None):
+    now = (now or datetime.now(timezone.utc)).astimezone(MARKET_TZ)
+    if now.weekday() >= 5:
+        return False
+    return MARKET_OPEN <= now.time() < MARKET_CLOSE
+
+
+def price_from_info(info):
+    # Try to get the regular, post-market, or previous close price
+    return info.get('regularMarketPrice') or \
+        info.get('postMarketPrice') or \
+        info.get('previousClose')
+
+
+class QuoteProvider:
+    """Upstream source of quote info dicts, keyed by ticker symbol."""
+
+    def fetch(self, ticker):
+        raise NotImplementedError
+
+
+class YFinanceQuoteProvider(QuoteProvider):
+    def fetch(self, ticker):
+        import yfinance as yf
+        return yf.Ticker(ticker).info
+
+
+class StaticQuoteProvider(QuoteProvider):
+    """Serves quotes from a local dict, for tests and benchmarks.
+
+    `latency` simulates a slow upstream so coalescing can be measured.
+    """
+
+    def __init__(self, quotes=None, latency=0.0):
+        self.quotes = {k.upper(): v for k, v in (quotes or {}).items()}
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def fetch(self, ticker):
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        info = self.quotes.get(ticker.upper())
+        if info is None:
+            raise ValueError(f'Unknown ticker {ticker}')
+        return dict(info)
+
+
+class ReplayQuoteProvider(QuoteProvider):
+    """Serves quotes recorded under `directory`/quotes.json, and made-up
+    but deterministic ones for other tickers when `synthetic` is set.
+
+    Lets the app and benchmarks run with no network. Prices agree with the
+    last close of ReplayHistoryProvider's synthetic bars.
+    """
+
+    def __init__(self, directory=None, synthetic=None):
+        self.directory = directory or os.environ.get('REPLAY_DIR', 'fixtures')
+        if synthetic is None:
+            synthetic = os.environ.get('REPLAY_SYNTHETIC', '1') == '1'
+        self.synthetic = synthetic
+        path = os.path.join(self.directory, 'quotes.json')
+        self.quotes = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.quotes = {k.upper(): v for k, v in json.load(f).items()}
+
+    def fetch(self, ticker):
+        ticker = ticker.upper()
+        info = self.quotes.get(ticker)
+        if info is not None:
+            return dict(info)
+        if not self.synthetic:
+            raise ValueError(f'No recorded quote for {ticker}')
+        from history import synthetic_closes
+        closes = synthetic_closes(ticker, datetime.utcnow())
+        return {
+            'symbol': ticker,
+            'longName': f'{ticker} Synthetic Inc.',
+            'regularMarketPrice': float(closes.iloc[-1]),
+            'previousClose': float(closes.iloc[-2]),
+            'website': f'{ticker.lower()}.example.com',
+        }
+
+
+class RecordingQuoteProvider(QuoteProvider):
+    """Passes fetches to yfinance and saves them as replay fixtures."""
+
+    def __init__(self, directory=None, provider=None):
+        self.directory = directory or os.environ.get('REPLAY_DIR', 'fixtures')
+        self.provider = provider or YFinanceQuoteProvider()
+        self._lock = threading.Lock()
+
+    def fetch(self, ticker):
+        info = self.provider.fetch(ticker)
+        path = os.path.join(self.directory, 'quotes.json')
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            quotes = {}
+            if os.path.exists(path):
+                with open(path) as f:
+                    quotes = json.load(f)
+            quotes[ticker.upper()] = info
+            with open(path, 'w') as f:
+                json.dump(quotes, f, indent=1, sort_keys=True, default=str)
+        return info
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class QuoteCache:
+    """Bounded LRU of quote info with market-hours aware TTLs.
+
+    Concurrent misses on the same ticker are coalesced so only one thread
+    goes upstream; the others wait for its result. Callers can pass a
+    timeout and stop waiting, in which case the fetch finishes in the
+    background and still fills the cache.
+    """
+
+    def __init__(self, provider, maxsize=1024, ttl_open=15, ttl_closed=900,
+                 clock=time.monotonic, market_open=is_market_open,
+                 executor=None):
+        self.provider = provider
+        self.executor = executor or fetcher.executor
+        self.maxsize = maxsize
+        self.ttl_open = ttl_open
+        self.ttl_closed = ttl_closed
+        self.clock = clock
+        self.market_open = market_open
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.coalesced = 0
+
+    def ttl(self):
+        return self.ttl_open if self.market_open() else self.ttl_closed
+
+    def peek(self, ticker):
+        """Return (info, fetched_at) without checking expiry or fetching."""
+        with self._lock:
+            entry = self._entries.get(ticker.upper())
+        return entry if entry is not None else (None, None)
+
+    def _lookup(self, key, now, ttl):
+        # Caller holds the lock. Returns (info, call, leader).
+        entry = self._entries.get(key)
+        if entry is not None and now - entry[1] < ttl:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], None, False
+
+        self.misses += 1
+        call = self._inflight.get(key)
+        if call is not None:
+            self.coalesced += 1
+            return None, call, False
+        call = self._inflight[key] = _Call()
+        return None, call, True
+
+    def _fill(self, key, call):
+        try:
+            with metrics.upstream_call('quotes'):
+                call.result = self.provider.fetch(key)
+            self.put(key, call.result)
+        except Exception as e:
+            call.error = e
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            call.event.set()
+
+    def get(self, ticker, timeout=None):
+        """Return quote info for one ticker.
+
+        Raises UpstreamTimeout if a miss is not filled within `timeout`.
+        """
+        key = ticker.upper()
+        with self._lock:
+            info, call, leader = self._lookup(key, self.clock(), self.ttl())
+        if call is None:
+            return info
+
+        with metrics.phase('upstream'):
+            if leader:
+                if timeout is None:
+                    self._fill(key, call)
+                else:
+                    self.executor.submit(self._fill, key, call)
+            filled = call.event.wait(timeout)
+        if not filled:
+            raise UpstreamTimeout(f'Timed out fetching quote for {key}')
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def get_many(self, tickers, timeout=None, max_age=None):
+        """Look up several tickers at once.
+
+        Misses are fetched in parallel on the shared upstream pool. Tickers
+        not filled within `timeout` fall back to their last cached quote,
+        however old. `max_age` tightens the TTL for this lookup. Returns
+        ({ticker: info}, {ticker: error message}, [stale tickers]).
+        """
+        results, errors, stale, waiting = {}, {}, [], {}
+        with self._lock:
+            now, ttl = self.clock(), self.ttl()
+            if max_age is not None:
+                ttl = min(ttl, max_age)
+            for key in dict.fromkeys(t.upper() for t in tickers):
+                info, call, leader = self._lookup(key, now, ttl)
+                if call is None:
+                    results[key] = info
+                    continue
+                if leader:
+                    self.executor.submit(self._fill, key, call)
+                waiting[key] = call
+
+        deadline = fetcher.Deadline(timeout)
+        for key, call in waiting.items():
+            with metrics.phase('upstream'):
+                filled = call.event.wait(deadline.remaining())
+            if not filled:
+                info, _ = self.peek(key)
+                if info is not None:
+                    results[key] = info
+                    stale.append(key)
+                else:
+                    errors[key] = TIMEOUT_ERROR
+            elif call.error is not None:
+                errors[key] = str(call.error)
+            else:
+                results[key] = call.result
+        return results, errors, stale
+
+    def put(self, ticker, info, fetched_at=None):
+        key = ticker.upper()
+        with self._lock:
+            self._entries[key] = (info, fetched_at or self.clock())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, ticker=None):
+        with self._lock:
+            if ticker is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(ticker.upper(), None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'coalesced': self.coalesced,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+            }
+
+
+PROVIDERS = {
+    'yfinance': YFinanceQuoteProvider,
+    'static': StaticQuoteProvider,
+    'replay': ReplayQuoteProvider,
+    'record': RecordingQuoteProvider,
+}
+
+
+def create_quote_cache(provider=None):
+    if provider is None:
+        provider = PROVIDERS[os.environ.get('QUOTE_PROVIDER', 'yfinance')]()
+    return QuoteCache(
+        provider,
+        maxsize=int(os.environ.get('QUOTE_CACHE_SIZE', 1024)),
+        ttl_open=float(os.environ.get('QUOTE_TTL_OPEN', 15)),
+        ttl_closed=float(os.environ.get('QUOTE_TTL_CLOSED', 900)),
+    )
@@ -0,0 +1,58 @@
+# serialize.py
+
+import numpy as np
+import orjson
+from flask import Response, request
+from flask.json.provider import DefaultJSONProvider
+
+import metrics
+
+JSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def frame_columns(frame, columns, date_format='%Y-%m-%d'):
+    """Columnar payload straight from a DataFrame's numpy arrays.
+
+    `columns` maps payload names to (frame column, dtype).
+    """
+    payload = {'date': frame.index.strftime(date_format).tolist()}
+    for name, (column, dtype) in columns.items():
+        values = frame[column]
+        if np.issubdtype(dtype, np.integer):
+            values = values.fillna(0)
+        payload[name] = values.to_numpy(dtype=dtype)
+    return payload
+
+
+def to_rows(payload):
+    """Row-oriented list of dicts, the original response shape."""
+    keys = list(payload)
+    columns = [v.tolist() if isinstance(v, np.ndarray) else v
+               for v in payload.values()]
+    return [dict(zip(keys, values)) for values in zip(*columns)]
+
+
+def wants_rows():
+    return request.args.get('shape') == 'rows'
+
+
+def json_response(payload, status=200, headers=None):
+    # orjson writes numpy arrays directly and NaN as null
+    with metrics.phase('serialize'):
+        body = orjson.dumps(payload, option=JSON_OPTIONS)
+    return Response(body, status=status, headers=headers,
+                    mimetype='application/json')
+
+
+def series_response(payload, status=200, headers=None):
+    """Columnar by default, rows with ?shape=rows."""
+    return json_response(to_rows(payload) if wants_rows() else payload,
+                         status, headers)
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider, with jsonify() counted as serialization."""
+
+    def dumps(self, obj, **kwargs):
+        with metrics.phase('serialize'):
+            return super().dumps(obj, **kwargs)
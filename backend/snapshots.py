@@ -0,0 +1,28 @@
+# snapshots.py
+
+from cache import TTLCache
+from positions import get_ledger_version
+
+
+class LedgerSnapshots:
+    """Per-process cache of values derived from each user's ledger.
+
+    Entries are keyed by the user's ledger version, so a trade in any
+    worker invalidates them on the next read and nothing has to be pushed
+    between processes. Checking costs one primary key lookup.
+    """
+
+    def __init__(self, maxsize=1024, ttl=3600):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, user_id, name, loader):
+        """Return loader(user_id), reusing it until the ledger changes."""
+        key = (user_id, name, get_ledger_version(user_id))
+        value = self._cache.get(key)
+        if value is None:
+            value = loader(user_id)
+            self._cache.put(key, value)
+        return value
+
+    def stats(self):
+        return self._cache.stats()
@@ -0,0 +1,160 @@
+# streaming.py
+
+import logging
+import queue
+import threading
+
+from quotes import is_market_open, price_from_info
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    def __init__(self, tickers, maxsize=100):
+        self.tickers = tickers
+        self.queue = queue.Queue(maxsize=maxsize)
+
+    def push(self, event):
+        # A slow client loses its oldest updates rather than blocking the
+        # poller for everyone else
+        while True:
+            try:
+                self.queue.put_nowait(event)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class PriceStreamer:
+    """Polls each subscribed ticker once per interval and fans the changes
+    out to every subscriber, so upstream load scales with the number of
+    distinct tickers rather than with clients.
+
+    Subscriptions are reference counted per ticker; a ticker nobody is
+    watching is no longer polled, and the poller thread exits when there
+    are no subscribers at all.
+
+    Outside market hours quotes barely change, so tickers are polled
+    every `closed_interval` seconds instead; new subscribers still get a
+    price straight away.
+
+    Each open stream holds a worker thread for as long as the client is
+    connected, so at most `max_subscriptions` are allowed at once;
+    subscribe() returns None beyond that.
+    """
+
+    def __init__(self, quote_cache, interval=5.0, max_subscriptions=None,
+                 closed_interval=300.0, market_open=is_market_open):
+        self.quote_cache = quote_cache
+        self.interval = interval
+        self.closed_interval = closed_interval
+        self.market_open = market_open
+        self.max_subscriptions = max_subscriptions
+        self._refcounts = {}
+        self._subscriptions = set()
+        self._last = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def subscribe(self, tickers):
+        tickers = list(dict.fromkeys(t.upper() for t in tickers))
+        subscription = Subscription(tickers)
+        with self._lock:
+            if self.max_subscriptions is not None and \
+                    len(self._subscriptions) >= self.max_subscriptions:
+                return None
+            self._subscriptions.add(subscription)
+            for ticker in tickers:
+                self._refcounts[ticker] = self._refcounts.get(ticker, 0) + 1
+            snapshot = {t: self._last[t] for t in tickers if t in self._last}
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='price-streamer', daemon=True)
+                self._thread.start()
+            else:
+                # Poll new tickers now instead of after a full interval
+                self._wakeup.set()
+        for event in snapshot.values():
+            subscription.push(event)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            if subscription not in self._subscriptions:
+                return
+            self._subscriptions.discard(subscription)
+            for ticker in subscription.tickers:
+                self._refcounts[ticker] -= 1
+                if self._refcounts[ticker] <= 0:
+                    del self._refcounts[ticker]
+                    self._last.pop(ticker, None)
+
+    def watched(self):
+        with self._lock:
+            return dict(self._refcounts)
+
+    def connections(self):
+        with self._lock:
+            return len(self._subscriptions)
+
+    def current_interval(self):
+        return self.interval if self.market_open() else self.closed_interval
+
+    def poll(self):
+        with self._lock:
+            tickers = list(self._refcounts)
+        if not tickers:
+            return
+
+        quotes, errors, _ = self.quote_cache.get_many(
+            tickers, timeout=self.interval, max_age=self.current_interval())
+        if errors:
+            logger.warning(f'Price stream quote errors: {errors}')
+
+        changed = {}
+        with self._lock:
+            for ticker, info in quotes.items():
+                if ticker not in self._refcounts:
+                    continue
+                price = price_from_info(info)
+                previous = self._last.get(ticker)
+                if previous is not None and previous['price'] == price:
+                    continue
+                event = {
+                    'ticker': ticker,
+                    'price': price,
+                    'previous_close': info.get('previousClose'),
+                    'change': price - info['previousClose']
+                    if price is not None and info.get('previousClose')
+                    else None,
+                }
+                self._last[ticker] = changed[ticker] = event
+            subscriptions = list(self._subscriptions)
+
+        for subscription in subscriptions:
+            for ticker in subscription.tickers:
+                if ticker in changed:
+                    subscription.push(changed[ticker])
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._subscriptions:
+                    self._thread = None
+                    return
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error(f'Price stream poll failed: {e}', exc_info=True)
+            self._wakeup.wait(self.current_interval())
+            self._wakeup.clear()
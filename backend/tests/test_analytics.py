@@ -0,0 +1,50 @@
+import pandas as pd
+import pytest
+
+from analytics import portfolio_analytics
+
+DATES = pd.date_range('2024-01-01', periods=4, freq='B')
+# Returns: A +10%, -10%, +10%; SPY +5%, -10%, +10%
+CLOSES = pd.DataFrame({
+    'A': [100.0, 110.0, 99.0, 108.9],
+    'SPY': [100.0, 105.0, 94.5, 103.95],
+}, index=DATES)
+
+
+def holdings(**quantities):
+    return pd.DataFrame(quantities, index=DATES)
+
+
+def test_time_weighted_return_drawdown_and_beta():
+    result = portfolio_analytics(CLOSES, holdings(A=[1, 1, 1, 1]), ['A'],
+                                 'SPY')
+    assert result['time_weighted_return'] == pytest.approx(
+        1.1 * 0.9 * 1.1 - 1)
+    # Growth 1.1 -> 0.99 is the worst fall from a peak
+    assert result['max_drawdown'] == pytest.approx(0.99 / 1.1 - 1)
+    # cov(p, b) / var(b) worked out by hand: (21/900) / (19.5/900)
+    assert result['beta'] == pytest.approx(14 / 13)
+    assert result['positions']['A']['beta'] == pytest.approx(14 / 13)
+    assert result['positions']['A']['weight'] == pytest.approx(1.0)
+
+
+def test_buys_do_not_count_as_returns():
+    # Doubling the position mid-way changes value, not the return
+    result = portfolio_analytics(CLOSES, holdings(A=[1, 1, 2, 2]), ['A'],
+                                 'SPY')
+    assert result['time_weighted_return'] == pytest.approx(
+        1.1 * 0.9 * 1.1 - 1)
+
+
+def test_held_benchmark_stays_in_the_portfolio():
+    result = portfolio_analytics(CLOSES, holdings(SPY=[1, 1, 1, 1]),
+                                 ['SPY'], 'SPY')
+    assert list(result['positions']) == ['SPY']
+    assert result['time_weighted_return'] == pytest.approx(
+        1.05 * 0.9 * 1.1 - 1)
+    assert result['beta'] == pytest.approx(1.0)
+
+
+def test_too_little_history():
+    assert portfolio_analytics(CLOSES.iloc[:2], holdings(A=[1, 1, 1, 1]),
+                               ['A'], 'SPY') is None
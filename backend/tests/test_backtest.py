@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest import rebalance_mask, simulate_trades, simulate_weights, \
+    parse_trades, BacktestError
+
+DATES = pd.date_range('2024-01-02', periods=3, freq='B')
+CLOSES = pd.DataFrame({'A': [10.0, 12.0, 15.0]}, index=DATES)
+
+
+def trades(*rows):
+    return parse_trades([{'date': d, 'ticker': t, 'quantity': q, 'type': s}
+                         for d, t, q, s in rows])
+
+
+def test_trades_before_the_range_fill_on_the_first_date():
+    values, _ = simulate_trades(CLOSES, trades(
+        ('2023-06-01', 'A', 2, 'buy'),     # before the range: fills at 10
+        (str(DATES[1].date()), 'A', 1, 'sell'),
+        ('2025-01-01', 'A', 5, 'buy'),     # after the range: dropped
+    ), initial=100.0)
+    # Cash 80 + 2 x 10, then 92 + 1 x 12, then 92 + 1 x 15
+    assert values[0] == pytest.approx([100.0, 104.0, 107.0])
+
+
+def test_trade_costs():
+    values, _ = simulate_trades(CLOSES, trades(
+        ('2023-06-01', 'A', 2, 'buy'),
+        (str(DATES[1].date()), 'A', 1, 'sell'),
+    ), initial=100.0, cost=0.01)
+    # 1% of 20 bought, then of 12 sold
+    assert values[0] == pytest.approx([99.8, 103.68, 106.68])
+
+
+def test_weights_hold_shares_between_rebalances():
+    prices = np.array([[10.0, 20.0], [20.0, 20.0], [20.0, 10.0]])
+    mask = np.array([True, False, False])
+    values, turnover = simulate_weights(
+        prices, np.array([[0.5, 0.5], [1.0, 0.0]]), mask, initial=100.0)
+    # 5 A + 2.5 B, and 10 A
+    assert values[0] == pytest.approx([100.0, 150.0, 125.0])
+    assert values[1] == pytest.approx([100.0, 200.0, 200.0])
+    assert turnover == pytest.approx([0.0, 0.0])
+
+
+def test_weights_without_a_price_stay_cash():
+    prices = np.array([[10.0, np.nan], [20.0, np.nan]])
+    values, _ = simulate_weights(prices, np.array([[0.5, 0.5]]),
+                                 np.array([True, False]), initial=100.0)
+    assert values[0] == pytest.approx([100.0, 150.0])
+
+
+def test_rebalance_mask():
+    dates = pd.to_datetime(['2024-01-30', '2024-01-31', '2024-02-01',
+                            '2024-02-02', '2024-03-01'])
+    assert list(rebalance_mask(dates, 'monthly')) == \
+        [True, False, True, False, True]
+    assert list(rebalance_mask(dates, 'none')) == \
+        [True, False, False, False, False]
+    with pytest.raises(BacktestError):
+        rebalance_mask(dates, 'hourly')
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from downsample import downsample, lttb, ohlc, MIN_POINTS
+
+
+def bars(n):
+    index = pd.date_range('2024-01-01', periods=n, freq='D')
+    close = np.sin(np.arange(n) / 3.0) * 10 + 100
+    return pd.DataFrame({
+        'Open': close - 1, 'High': close + 2, 'Low': close - 2,
+        'Close': close, 'Volume': np.arange(n, dtype=float) + 1,
+    }, index=index)
+
+
+def test_ohlc_buckets():
+    frame = bars(10)
+    frame.iloc[3, frame.columns.get_loc('High')] = 500.0
+    frame.iloc[7, frame.columns.get_loc('Low')] = 1.0
+    result = ohlc(frame, 3)
+    # Buckets are rows 0-2, 3-5 and 6-9
+    assert list(result.index) == list(frame.index[[0, 3, 6]])
+    assert list(result['Open']) == list(frame['Open'].iloc[[0, 3, 6]])
+    assert list(result['Close']) == list(frame['Close'].iloc[[2, 5, 9]])
+    assert list(result['High']) == [frame['High'].iloc[0:3].max(), 500.0,
+                                    frame['High'].iloc[6:10].max()]
+    assert list(result['Low']) == [frame['Low'].iloc[0:3].min(),
+                                   frame['Low'].iloc[3:6].min(), 1.0]
+    assert list(result['Volume']) == [1 + 2 + 3, 4 + 5 + 6, 7 + 8 + 9 + 10]
+
+
+def test_ohlc_ignores_missing_highs_and_lows():
+    frame = bars(6)
+    frame.iloc[0, frame.columns.get_loc('High')] = np.nan
+    frame.iloc[1, frame.columns.get_loc('Low')] = np.nan
+    result = ohlc(frame, 2)
+    assert result['High'].iloc[0] == frame['High'].iloc[1:3].max()
+    assert result['Low'].iloc[0] == min(frame['Low'].iloc[0],
+                                        frame['Low'].iloc[2])
+
+
+def test_lttb_keeps_endpoints_and_count():
+    frame = bars(200)
+    result = lttb(frame, 20)
+    assert len(result) == 20
+    assert result.index[0] == frame.index[0]
+    assert result.index[-1] == frame.index[-1]
+    # Real bars, in time order
+    assert result.index.is_monotonic_increasing
+    assert result.index.isin(frame.index).all()
+
+
+def test_lttb_keeps_a_spike():
+    frame = bars(100)
+    frame.iloc[41, frame.columns.get_loc('Close')] = 1000.0
+    assert frame.index[41] in lttb(frame, 10).index
+
+
+@pytest.mark.parametrize('mode', ['ohlc', 'lttb'])
+def test_short_series_are_returned_whole(mode):
+    frame = bars(5)
+    assert len(downsample(frame, 10, mode)) == 5
+
+
+@pytest.mark.parametrize('mode', ['ohlc', 'lttb'])
+@pytest.mark.parametrize('points', [MIN_POINTS - 1, 0, -5])
+def test_downsample_rejects_too_few_points(mode, points):
+    with pytest.raises(ValueError):
+        downsample(bars(50), points, mode)
+
+
+def test_downsample_minimum_points():
+    assert len(downsample(bars(50), MIN_POINTS, 'lttb')) == MIN_POINTS
+    assert len(downsample(bars(50), MIN_POINTS, 'ohlc')) == MIN_POINTS
+
+
+def test_downsample_unknown_mode():
+    with pytest.raises(ValueError):
+        downsample(bars(50), 10, 'median')
@@ -0,0 +1,39 @@
+import io
+
+import pytest
+
+from importer import parse_row, read_records
+
+VALID = {'ticker': 'aapl', 'side': 'Buy', 'quantity': '3', 'price': '10.5',
+         'timestamp': '2024-01-02T15:30:00+01:00'}
+
+
+def test_parse_row_normalizes():
+    row = parse_row(VALID)
+    assert row['ticker'] == 'AAPL'
+    assert row['transaction_type'] == 'buy'
+    assert row['quantity'] == 3
+    assert row['price'] == 10.5
+    # Stored as naive UTC
+    assert row['timestamp'].isoformat() == '2024-01-02T14:30:00'
+
+
+@pytest.mark.parametrize('quantity', ['inf', '-inf', 'nan', '1e400', '1.5',
+                                      '0', '-2', 'abc'])
+def test_parse_row_rejects_bad_quantities(quantity):
+    with pytest.raises(ValueError):
+        parse_row(dict(VALID, quantity=quantity))
+
+
+@pytest.mark.parametrize('price', ['inf', 'nan', '1e400', '0', '-1'])
+def test_parse_row_rejects_bad_prices(price):
+    with pytest.raises(ValueError):
+        parse_row(dict(VALID, price=price))
+
+
+def test_read_records_reports_bad_json_per_line():
+    stream = io.BytesIO(b'{"ticker": "AAPL"}\nnot json\n\n{"Ticker": "MSFT"}\n')
+    records = list(read_records(stream, 'ndjson'))
+    assert records[0] == {'ticker': 'AAPL'}
+    assert isinstance(records[1], ValueError)
+    assert records[2] == {'ticker': 'MSFT'}
@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from lots import LotBook, RECENT_SALES
+
+DAY = datetime(2024, 1, 2)
+
+
+def book_with(method, trades):
+    book = LotBook(method)
+    for i, (side, quantity, price) in enumerate(trades, start=1):
+        book.apply(i, 'AAPL', side, quantity, price, DAY + timedelta(days=i))
+    return book
+
+
+# Buy 10 @ 10, buy 10 @ 20, sell 15 @ 30
+TRADES = [('buy', 10, 10.0), ('buy', 10, 20.0), ('sell', 15, 30.0)]
+
+
+@pytest.mark.parametrize('method, realized, open_lots', [
+    # 10 @ 10 then 5 @ 20 are sold
+    ('fifo', 15 * 30 - (10 * 10 + 5 * 20), [[5, 20.0]]),
+    # 10 @ 20 then 5 @ 10
+    ('lifo', 15 * 30 - (10 * 20 + 5 * 10), [[5, 10.0]]),
+    # One merged lot at 15
+    ('average', 15 * 30 - 15 * 15, [[5, 15.0]]),
+])
+def test_realized_pl(method, realized, open_lots):
+    book = book_with(method, TRADES)
+    lots = book.tickers['AAPL']
+    assert lots.realized == pytest.approx(realized)
+    assert [lot[:2] for lot in lots.lots] == open_lots
+
+
+def test_unmatched_sell_is_reported():
+    book = book_with('fifo', [('buy', 2, 10.0), ('sell', 5, 12.0)])
+    (_, sale), = book.tickers['AAPL'].sales
+    assert sale['unmatched_quantity'] == 3
+    assert sale['realized_pl'] == pytest.approx(2 * 12 - 2 * 10)
+    assert not book.tickers['AAPL'].lots
+
+
+def test_sales_are_bounded_but_realized_pl_is_not():
+    trades = [('buy', 1, 10.0), ('sell', 1, 11.0)] * (RECENT_SALES + 50)
+    book = book_with('fifo', trades)
+    lots = book.tickers['AAPL']
+    assert len(lots.sales) == RECENT_SALES
+    assert book.sale_count == RECENT_SALES + 50
+    assert lots.realized == pytest.approx(RECENT_SALES + 50)
+
+
+def test_unknown_method():
+    with pytest.raises(ValueError):
+        LotBook('hifo')
@@ -0,0 +1,25 @@
+import pytest
+
+from tickers import TickerIndex
+
+INDEX = TickerIndex([
+    ('AAPL', 'Apple Inc.'),
+    ('AMZN', 'Amazon.com, Inc.'),
+    ('AMD', 'Advanced Micro Devices, Inc.'),
+])
+
+
+def test_search_orders_symbol_then_name_matches():
+    assert [r['symbol'] for r in INDEX.search('am')] == ['AMD', 'AMZN']
+    assert [r['symbol'] for r in INDEX.search('apple')] == ['AAPL']
+    # One typo away
+    assert [r['symbol'] for r in INDEX.search('amazom')] == ['AMZN']
+
+
+def test_search_respects_limit():
+    assert len(INDEX.search('a', limit=2)) == 2
+
+
+@pytest.mark.parametrize('limit', [0, -1])
+def test_search_without_room_returns_nothing(limit):
+    assert INDEX.search('a', limit=limit) == []
@@ -0,0 +1,17 @@
+import pytest
+
+from trades import parse_quantity
+
+
+@pytest.mark.parametrize('value, expected', [
+    (2, 2), ('3', 3), (4.0, 4), ('5.0', 5),
+])
+def test_parse_quantity_accepts_whole_numbers(value, expected):
+    assert parse_quantity(value) == expected
+
+
+@pytest.mark.parametrize('value', [
+    1.5, '1.5', 0, -1, 'abc', None, True, 'inf', 'nan', '1e400', [], {},
+])
+def test_parse_quantity_rejects(value):
+    assert parse_quantity(value) is None
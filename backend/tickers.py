@@ -0,0 +1,205 @@
+# tickers.py
+
+from bisect import bisect_left
+import csv
+import io
+from itertools import chain
+import logging
+import os
+import re
+import threading
+import urllib.request
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LISTING = os.path.join(os.path.dirname(__file__), 'data',
+                               'listings.csv')
+
+# NASDAQ Trader's symbol directory covers every US-listed stock and ETF
+LISTING_URLS = (
+    'https://www.nasdaqtrader.com/dynamic/SymDir/nasdaqlisted.txt',
+    'https://www.nasdaqtrader.com/dynamic/SymDir/otherlisted.txt',
+)
+
+# Anything a Yahoo symbol can be made of; other input never goes upstream
+SYMBOL = re.compile(r'[A-Z0-9^=.\-]{1,15}')
+# Shape of the US listings the index covers (with Yahoo's class suffix,
+# e.g. BRK-B). Indices (^GSPC), currencies (EUR=X), crypto (BTC-USD) and
+# foreign listings (SHOP.TO) aren't in the listing, so they aren't checked.
+US_SYMBOL = re.compile(r'[A-Z]{1,5}(-[A-Z])?')
+
+WORD = re.compile(r'[a-z0-9]+')
+# Words this short match too much to be worth fuzzy matching
+MIN_FUZZY_LENGTH = 4
+
+
+def _deletes(word):
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+class TickerIndex:
+    """In-memory index of listed symbols and company names.
+
+    Symbols and name words are kept in sorted lists, so a prefix lookup is
+    two bisects. Misspelled names are matched within one edit by looking
+    up every single-character deletion of the query word in a map built
+    from the vocabulary's deletions (the SymSpell approach), so nothing is
+    scanned.
+    """
+
+    def __init__(self, listings=()):
+        listings = sorted({symbol: name for symbol, name in listings}.items())
+        self.symbols = [symbol for symbol, _ in listings]
+        self.names = [name for _, name in listings]
+
+        postings = sorted(
+            (word, i) for i, name in enumerate(self.names)
+            for word in set(WORD.findall(name.lower())))
+        self.words = [word for word, _ in postings]
+        self.word_ids = [i for _, i in postings]
+
+        self.deletes = {}
+        for word in dict.fromkeys(self.words):
+            if len(word) >= MIN_FUZZY_LENGTH:
+                for deleted in _deletes(word) | {word}:
+                    self.deletes.setdefault(deleted, []).append(word)
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, symbol):
+        i = bisect_left(self.symbols, symbol)
+        return i < len(self.symbols) and self.symbols[i] == symbol
+
+    def is_valid(self, symbol):
+        """False only for symbols that can't exist: malformed ones, and
+        US-shaped ones missing from a loaded listing."""
+        if not SYMBOL.fullmatch(symbol):
+            return False
+        if not self.symbols or not US_SYMBOL.fullmatch(symbol):
+            return True
+        return symbol in self
+
+    def _prefix_range(self, keys, prefix):
+        return bisect_left(keys, prefix), bisect_left(keys, prefix + '\uffff')
+
+    def _fuzzy_ids(self, word):
+        # A generator, so it only runs when exact matches run out
+        if len(word) < MIN_FUZZY_LENGTH:
+            return
+        matches = set()
+        for deleted in _deletes(word) | {word}:
+            matches.update(self.deletes.get(deleted, ()))
+        for match in sorted(matches):
+            start = bisect_left(self.words, match)
+            end = bisect_left(self.words, match + '\0')
+            yield from self.word_ids[start:end]
+
+    def search(self, query, limit=10):
+        """Best matches for `query`: the exact symbol, symbols starting with
+        it, company names with a word starting with it, then names within
+        one typo. Candidates are generated lazily and stop at `limit`."""
+        symbol = query.strip().upper()
+        words = WORD.findall(query.lower())
+        if not symbol or not words or limit < 1:
+            return []
+        first, rest = words[0], words[1:]
+
+        def name_matches(i):
+            # Every further query word has to start a word of the name
+            name_words = WORD.findall(self.names[i].lower())
+            return all(any(w.startswith(q) for w in name_words)
+                       for q in rest)
+
+        # An exact symbol sorts first within its own prefix range
+        symbols = range(*self._prefix_range(self.symbols, symbol))
+        names = (self.word_ids[j]
+                 for j in range(*self._prefix_range(self.words, first)))
+        candidates = chain(
+            symbols,
+            (i for i in names if name_matches(i)),
+            (i for i in self._fuzzy_ids(first) if name_matches(i)),
+        )
+
+        results, seen = [], set()
+        for i in candidates:
+            if i in seen:
+                continue
+            seen.add(i)
+            results.append({'symbol': self.symbols[i], 'name': self.names[i]})
+            if len(results) >= limit:
+                break
+        return results
+
+
+def read_listings(path):
+    """(symbol, name) pairs from a listing CSV with symbol and name columns."""
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            symbol = (row.get('symbol') or '').strip().upper()
+            if symbol:
+                yield symbol, (row.get('name') or '').strip()
+
+
+def parse_symbol_directory(text):
+    """(symbol, name) pairs from a NASDAQ Trader pipe-delimited file."""
+    rows = csv.DictReader(io.StringIO(text), delimiter='|')
+    for row in rows:
+        symbol = row.get('Symbol') or row.get('ACT Symbol') or ''
+        # Last line is "File Creation Time: ..."; skip test issues too
+        if not symbol or symbol.startswith('File Creation Time') or \
+                row.get('Test Issue') == 'Y':
+            continue
+        # Yahoo writes share classes with a dash (BRK.B -> BRK-B)
+        yield symbol.replace('.', '-'), row.get('Security Name', '')
+
+
+def download_listings(path=DEFAULT_LISTING, urls=LISTING_URLS):
+    """Fetch the NASDAQ Trader directory into a listing CSV at `path`."""
+    listings = {}
+    for url in urls:
+        with urllib.request.urlopen(url, timeout=30) as response:
+            text = response.read().decode('utf-8', errors='replace')
+        listings.update(parse_symbol_directory(text))
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['symbol', 'name'])
+        writer.writerows(sorted(listings.items()))
+    os.replace(tmp, path)
+    return len(listings)
+
+
+class LazyTickerIndex:
+    """Builds the index from the listing file on first use."""
+
+    def __init__(self, path=DEFAULT_LISTING):
+        self.path = path
+        self._index = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = self._load()
+        return self._index
+
+    def reload(self):
+        with self._lock:
+            self._index = self._load()
+        return self._index
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            logger.warning(f'No ticker listing at {self.path}; search is '
+                           f'empty and symbols are not validated. Run '
+                           f'`flask update-listings` to fetch one.')
+            return TickerIndex()
+        return TickerIndex(read_listings(self.path))
+
+
+def create_ticker_index():
+    return LazyTickerIndex(os.environ.get('TICKER_LISTING', DEFAULT_LISTING))
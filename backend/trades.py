@@ -0,0 +1,107 @@
+# trades.py
+
+from datetime import datetime
+import math
+
+from models import db, Transaction, Preference
+from positions import add_to_position, remove_from_position, \
+    bump_ledger_version
+
+BALANCE_KEY = 'portfolio_balance'
+
+
+class TradeError(Exception):
+    pass
+
+
+class InsufficientFunds(TradeError):
+    pass
+
+
+class InsufficientShares(TradeError):
+    pass
+
+
+def parse_quantity(value):
+    """A positive whole number of shares from request input, or None."""
+    # JSON true would otherwise pass as 1
+    if isinstance(value, bool):
+        return None
+    try:
+        quantity = float(value)
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(quantity) or quantity <= 0 or \
+            not quantity.is_integer():
+        return None
+    return int(quantity)
+
+
+def adjust_balance(user_id, delta):
+    """Atomically add `delta` to the user's cash balance. Caller commits.
+
+    A debit is rejected with InsufficientFunds instead of going negative.
+    """
+    balance = db.cast(Preference.value, db.Float)
+    stmt = db.update(Preference) \
+        .where(Preference.key == BALANCE_KEY,
+               Preference.user_id == user_id) \
+        .values(value=db.cast(balance + delta, db.Text)) \
+        .execution_options(synchronize_session=False)
+    if delta < 0:
+        stmt = stmt.where(balance >= -delta)
+
+    if db.session.execute(stmt).rowcount:
+        return
+
+    exists = db.session.execute(
+        db.select(Preference.id).filter_by(key=BALANCE_KEY, user_id=user_id)
+    ).first()
+    if exists is None:
+        raise TradeError('Portfolio balance is not set')
+    raise InsufficientFunds('Insufficient funds')
+
+
+def execute_trade(user_id, ticker, transaction_type, quantity, price,
+                  timestamp=None):
+    """Apply a buy or sell to the user's portfolio as a single database
+    transaction.
+
+    The balance update, position update and ledger insert commit together
+    or not at all. The balance row is always updated first so concurrent
+    trades lock rows in the same order.
+    """
+    ticker = ticker.upper()
+    quantity = int(quantity)
+    if quantity <= 0:
+        raise TradeError('Quantity must be positive')
+    if transaction_type not in ('buy', 'sell'):
+        raise TradeError(f'Unknown transaction type {transaction_type}')
+    timestamp = timestamp or datetime.utcnow()
+    amount = price * quantity
+
+    try:
+        if transaction_type == 'buy':
+            adjust_balance(user_id, -amount)
+            add_to_position(user_id, ticker, quantity, price, timestamp)
+        else:
+            adjust_balance(user_id, amount)
+            if not remove_from_position(user_id, ticker, quantity):
+                raise InsufficientShares(
+                    f'Cannot sell {quantity} {ticker}, not enough shares held')
+
+        transaction = Transaction(
+            user_id=user_id,
+            ticker=ticker,
+            quantity=quantity,
+            transaction_type=transaction_type,
+            price=price,
+            timestamp=timestamp
+        )
+        db.session.add(transaction)
+        bump_ledger_version(user_id)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return transaction
@@ -0,0 +1,30 @@
+# users.py
+
+import os
+import re
+
+from flask import g, request
+
+from models import DEFAULT_USER
+
+# Set by the authenticating proxy in front of the app; the app does no
+# authentication of its own. Requests without it act as DEFAULT_USER.
+USER_HEADER = 'X-User-Id'
+USER_ID = re.compile(r'[A-Za-z0-9_.@-]{1,36}')
+
+# Anyone who can reach the app can send the header, so it is only honoured
+# when a proxy that sets it (and strips it from clients) is in front.
+# Otherwise every request acts as DEFAULT_USER.
+TRUST_USER_HEADER = os.environ.get('TRUST_USER_HEADER', '0') == '1'
+
+
+def user_from_request():
+    """User id named by the request, or None if it is malformed."""
+    if not TRUST_USER_HEADER:
+        return DEFAULT_USER
+    user_id = request.headers.get(USER_HEADER) or DEFAULT_USER
+    return user_id if USER_ID.fullmatch(user_id) else None
+
+
+def current_user():
+    return g.user_id
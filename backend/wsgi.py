@@ -0,0 +1,7 @@
+# wsgi.py
+# Production entry point: gunicorn -c gunicorn.conf.py wsgi:app
+
+from app import app
+
+if __name__ == '__main__':
+    app.run(host='0.0.0.0')
@@ -2,6 +2,10 @@ import axios from 'axios';
 
 const instance = axios.create({
   baseURL: process.env.REACT_APP_API_URL || 'http://localhost:5000/api',
+  // Normally set by the auth proxy; lets local setups pick a portfolio
+  headers: process.env.REACT_APP_USER_ID
+    ? { 'X-User-Id': process.env.REACT_APP_USER_ID }
+    : {},
 });
 
 export default instance;
\ No newline at end of file
@@ -0,0 +1,14 @@
+// Convert a columnar API payload ({ date: [...], close: [...] }) into rows
+export function fromColumns<T>(columns: { [key: string]: any[] }): T[] {
+  const keys = Object.keys(columns);
+  const length = keys.length ? columns[keys[0]].length : 0;
+  const rows: T[] = [];
+  for (let i = 0; i < length; i++) {
+    const row: any = {};
+    for (const key of keys) {
+      row[key] = columns[key][i];
+    }
+    rows.push(row);
+  }
+  return rows;
+}
@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import axios from '../axiosConfig';
+import { fromColumns } from '../columnar';
 import {
   Typography,
   Table,
@@ -77,7 +78,7 @@ const Portfolio: React.FC = () => {
     const fetchPortfolioHistory = async () => {
       try {
         const response = await axios.get('/portfolio_history');
-        setPortfolioHistory(response.data);
+        setPortfolioHistory(fromColumns<PortfolioHistoryItem>(response.data));
       } catch (error) {
         console.error('Error fetching portfolio history:', error);
         alert('Failed to load portfolio history');
@@ -86,43 +87,91 @@ const Portfolio: React.FC = () => {
 
     const fetchPortfolioBalance = async () => {
       try {
-        const response = await axios.get('/preference', {
+        // Batched endpoint, so further settings can join this one request
+        const response = await axios.get('/preferences', {
           params: {
-            key: 'portfolio_balance'
+            keys: 'portfolio_balance'
           }
         });
-        console.log(response);
-        setPortfolioBalance(response.data.value);
+        setPortfolioBalance(response.data.values.portfolio_balance);
       } catch (error) {
         console.error('Error fetching portfolio balance:', error);
         alert('Failed to load portfolio balance');
       }
     };
 
-const makeAiRequest = async () => {
-  try {
-    const response = await axios.get('/ask_ai', {
-      headers: {
-        'Content-Type': 'application/json'  // Fix the case here
-      },
-      params: {  // Add missing comma
-        user_message: portfolioDetails.toString()
-      }
-    });
-    console.log(response);
-    setAiResponse(response.data.response);
-  } catch (error) {
-    console.error('Error fetching ai:', error);
-    alert('Failed to load ai');
-  }
-};
-
-    makeAiRequest();
     fetchPortfolioBalance();
     fetchPortfolioDetails();
     fetchPortfolioHistory();
   }, []);
 
+  // Live prices for the held tickers, pushed by the backend instead of polled
+  const heldTickers = portfolioDetails.map((item) => item.ticker).join(',');
+
+  // Ask for AI insights once per set of holdings. Prices are left out so the
+  // summary (and the backend's cache key) doesn't change on every tick; a 202
+  // means it is still being generated, so repeat the request until it's ready
+  useEffect(() => {
+    if (!heldTickers) {
+      return;
+    }
+    const summary = JSON.stringify(
+      portfolioDetails.map(({ ticker, quantity, cost_basis, purchase_date }) => ({
+        ticker, quantity, cost_basis, purchase_date,
+      }))
+    );
+    let cancelled = false;
+    const makeAiRequest = async (attempt = 0) => {
+      try {
+        const response = await axios.get('/ask_ai', {
+          params: { user_message: summary }
+        });
+        if (cancelled) {
+          return;
+        }
+        if (response.status === 202 && attempt < 30) {
+          setTimeout(() => makeAiRequest(attempt + 1), 2000);
+          return;
+        }
+        setAiResponse(response.data.response);
+      } catch (error) {
+        console.error('Error fetching ai:', error);
+      }
+    };
+    makeAiRequest();
+    return () => {
+      cancelled = true;
+    };
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [heldTickers]);
+  useEffect(() => {
+    if (!heldTickers) {
+      return;
+    }
+    const source = new EventSource(
+      `${axios.defaults.baseURL}/stream/prices?tickers=${heldTickers}`
+    );
+    source.onmessage = (event) => {
+      const { ticker, price } = JSON.parse(event.data);
+      if (price == null) {
+        return;
+      }
+      setPortfolioDetails((prev) =>
+        prev.map((item) =>
+          item.ticker === ticker
+            ? {
+                ...item,
+                current_price: price,
+                total_value: price * item.quantity,
+                unrealized_pl: (price - item.cost_basis) * item.quantity,
+              }
+            : item
+        )
+      );
+    };
+    return () => source.close();
+  }, [heldTickers]);
+
   return (
     <div style={{ padding: '20px' }}>
     <Grid 
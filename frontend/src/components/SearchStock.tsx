@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import axios from '../axiosConfig';
+import { fromColumns } from '../columnar';
 import {
   TextField,
   Button,
@@ -11,6 +12,7 @@ import {
   ListItemText,
   ListItemButton,
   ButtonGroup,
+  Autocomplete,
 } from '@mui/material';
 import StockChart from './charts/StockChart';
 
@@ -22,6 +24,7 @@ const SearchStock: React.FC = () => {
   const [timeRange, setTimeRange] = useState('1mo');
   const [quantity, setQuantity] = useState<number | ''>('');
   const [additionalInfo, setAdditionalInfo] = useState<any>(null);
+  const [suggestions, setSuggestions] = useState<{ symbol: string; name: string }[]>([]);
 
   // Load recent searches from localStorage and automatically search the most recent one
   useEffect(() => {
@@ -48,7 +51,7 @@ const SearchStock: React.FC = () => {
       const historyResponse = await axios.get(
         `/stock_history/${tickerToSearch}?range=${timeRange}`
       );
-      setHistoricalData(historyResponse.data);
+      setHistoricalData(fromColumns(historyResponse.data));
 
       // Update recent searches
       setRecentSearches((prev) => {
@@ -87,6 +90,26 @@ const SearchStock: React.FC = () => {
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [timeRange]);
 
+  // Typeahead from the backend's local symbol index, no upstream lookups
+  useEffect(() => {
+    if (!ticker) {
+      setSuggestions([]);
+      return;
+    }
+    let cancelled = false;
+    axios
+      .get('/search', { params: { q: ticker, limit: 8 } })
+      .then((response) => {
+        if (!cancelled) {
+          setSuggestions(response.data.results);
+        }
+      })
+      .catch((error) => console.error('Error searching tickers:', error));
+    return () => {
+      cancelled = true;
+    };
+  }, [ticker]);
+
   return (
     <div style={{ padding: '20px' }}>
       <Grid container spacing={2}>
@@ -196,11 +219,27 @@ const SearchStock: React.FC = () => {
         {/* Right Column */}
         <Grid item xs={12} md={3}>
           <Typography variant="h4" style={{ marginBottom: '20px' }}>Quote Lookup</Typography>
-          <TextField
-            label="Ticker Symbol"
-            value={ticker}
-            onChange={(e) => setTicker(e.target.value.toUpperCase())}
-            fullWidth
+          <Autocomplete
+            freeSolo
+            options={suggestions}
+            filterOptions={(options) => options}
+            getOptionLabel={(option) => (typeof option === 'string' ? option : option.symbol)}
+            renderOption={(props, option) => (
+              <li {...props} key={option.symbol}>
+                <strong>{option.symbol}</strong>&nbsp;{option.name}
+              </li>
+            )}
+            inputValue={ticker}
+            onInputChange={(_, value) => setTicker(value.toUpperCase())}
+            onChange={(_, option) => {
+              if (option && typeof option !== 'string') {
+                setTicker(option.symbol);
+                handleSearch(undefined, option.symbol);
+              }
+            }}
+            renderInput={(params) => (
+              <TextField {...params} label="Ticker Symbol" fullWidth />
+            )}
             style={{ marginBottom: '10px' }}
           />
           <Button